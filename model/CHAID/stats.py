@@ -1,10 +1,14 @@
-import collections as cl
 from .column import ContinuousColumn
 from .split import Split
+import heapq
 import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from math import isnan
+from multiprocessing import get_all_start_methods, get_context
 from scipy import stats
 from .invalid_split_reason import InvalidSplitReason
-from numpy import nan as NaN
 
 def chisquare(n_ij, weighted):
     """
@@ -36,16 +40,241 @@ def chisquare(n_ij, weighted):
     return (chi, p_val, dof)
 
 
+def chisquare_batch(tables, weighted):
+    """
+    Calculates the chisquare of many matrices of ind_v x dep_v at once.
+    Unweighted matrices of the same shape are scored in one vectorised
+    pass that gives the same values as calling chisquare on each
+    """
+    if weighted:
+        return [chisquare(n_ij, weighted) for n_ij in tables]
+
+    shapes = {}
+    for index, n_ij in enumerate(tables):
+        shapes.setdefault(n_ij.shape, []).append(index)
+
+    results = [None] * len(tables)
+    for shape, indices in shapes.items():
+        n_ij = np.array([tables[index] for index in indices])
+        m_ij = (n_ij.sum(axis=2)[:, :, np.newaxis] * n_ij.sum(axis=1)[:, np.newaxis, :]) / \
+            n_ij.sum(axis=(1, 2)).astype(float)[:, np.newaxis, np.newaxis]
+
+        dof = (shape[0] - 1) * (shape[1] - 1)
+        chi = ((n_ij.astype(np.float64) - m_ij)**2 / m_ij).reshape(len(indices), -1).sum(axis=1)
+        p_val = stats.chi2.sf(chi, dof)
+        for index, index_chi, index_p_val in zip(indices, chi, p_val):
+            results[index] = (index_chi, index_p_val, dof)
+    return results
+
+
+def contingency_table(ind_codes, ind_size, dep_codes, dep_size, weights=None):
+    """
+    Builds the ind_v x dep_v frequency matrix from dense integer codes in a
+    single pass. Weighted cells are summed over contiguous runs of the rows
+    in their original order, so they match a masked sum of the weights
+    """
+    cells = ind_codes * dep_size + dep_codes
+    if weights is None:
+        return np.bincount(cells, minlength=ind_size * dep_size).reshape(ind_size, dep_size)
+
+    order = np.argsort(cells, kind='stable')
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    n_ij = np.zeros(ind_size * dep_size)
+    n_ij[sorted_cells[starts]] = [run.sum() for run in np.split(np.asarray(weights)[order], starts[1:])]
+    return n_ij.reshape(ind_size, dep_size)
+
+
+def bartlett_statistics(values):
+    """
+    Calculates the statistics of a single group that Bartlett's test needs:
+    the size and the sample variance, with the mean and sum of squared
+    deviations that let two groups be merged without their values
+    """
+    n, variance = len(values), np.var(values, ddof=1)
+    return n, variance, np.mean(values), variance * (n - 1) if n > 1 else 0.0
+
+
+def bartlett_merge_statistics(first, second):
+    """
+    Combines the Bartlett statistics of two groups into those of their union
+    """
+    n = first[0] + second[0]
+    delta = second[2] - first[2]
+    m2 = first[3] + second[3] + delta**2 * first[0] * second[0] / n
+    return n, m2 / (n - 1), first[2] + delta * second[0] / n, m2
+
+
+def bartlett_from_statistics(groups):
+    """
+    Bartlett's test for equal variances from the statistics of each group,
+    computed exactly as scipy.stats.bartlett computes it from the values
+    """
+    k = len(groups)
+    Ni = np.array([group[0] for group in groups], dtype=float)
+    ssq = np.array([group[1] for group in groups], dtype=float)
+    Ntot = np.sum(Ni, axis=0)
+    spsq = np.sum((Ni - 1)*ssq, axis=0) / (1.0*(Ntot - k))
+    numer = (Ntot*1.0 - k) * np.log(spsq) - np.sum((Ni - 1.0)*np.log(ssq), axis=0)
+    denom = 1.0 + 1.0/(3*(k - 1)) * ((np.sum(1.0/(Ni - 1.0), axis=0)) - 1.0/(Ntot - k))
+    T = numer / denom
+    return T, stats.chi2.sf(T, k - 1)
+
+
+def levene_statistics(values):
+    """
+    Calculates the statistics of a single group that the median-centred
+    Levene test needs: the size, and the mean and sum of squares of the
+    absolute deviations from the median
+    """
+    deviations = abs(values - np.median(values, axis=0))
+    mean_deviation = np.mean(deviations, axis=0)
+    return len(values), mean_deviation, np.sum((deviations - mean_deviation)**2, axis=0)
+
+
+def levene_from_statistics(groups):
+    """
+    Levene's test for equal variances from the statistics of each group,
+    computed exactly as scipy.stats.levene computes it from the values
+    """
+    k = len(groups)
+    Ni = np.array([group[0] for group in groups], dtype=float)
+    Zbari = np.array([group[1] for group in groups], dtype=float)
+    Ntot = np.sum(Ni, axis=0)
+
+    Zbar = 0.0
+    for i in range(k):
+        Zbar += Zbari[i] * Ni[i]
+    Zbar /= Ntot
+    numer = (Ntot - k) * np.sum(Ni * (Zbari - Zbar)**2, axis=0)
+
+    dvar = 0.0
+    for group in groups:
+        dvar += group[2]
+    denom = (k - 1.0) * dvar
+
+    W = numer / denom
+    return W, stats.f.sf(W, k-1, Ntot-k)
+
+
+ScoredGrouping = namedtuple('ScoredGrouping', 'grouping order score p table skip stop')
+
+
+class MergeQueue(object):
+    """
+    The scored possible groupings of an independent variable while its
+    groups are merged. Every grouping is scored once and kept in heaps, a
+    merge rescores only the groupings involving the merged group, and
+    groupings that no longer exist are dropped when they surface
+
+    Parameters
+    ----------
+    ind_var : Column
+        the variable whose groups are merged
+    score_groupings : callable
+        returns for a list of groupings a tuple (score, p, table, skip, stop)
+        each. A skipped grouping is never chosen, and the first grouping
+        to stop ends the scan and is chosen
+    """
+    def __init__(self, ind_var, score_groupings):
+        self.ind_var = ind_var
+        self.score_groupings = score_groupings
+        self._scored = {}
+        self._touching = {}
+        self._count = 0
+        self._best, self._first, self._stops, self._last = [], [], [], []
+        self._push(list(ind_var.possible_groupings()))
+
+    def _push(self, groupings):
+        for grouping, result in zip(groupings, self.score_groupings(groupings)):
+            scored = ScoredGrouping(grouping, self.ind_var.grouping_order(grouping), *result)
+            self._scored[grouping] = scored
+            for key in grouping:
+                self._touching.setdefault(key, []).append(grouping)
+
+            self._count += 1
+            heapq.heappush(self._last, (tuple(-k for k in scored.order), self._count, scored))
+            if scored.skip:
+                continue
+            elif scored.stop:
+                heapq.heappush(self._stops, (scored.order, self._count, scored))
+            else:
+                heapq.heappush(self._first, (scored.order, self._count, scored))
+                if not isnan(scored.p):
+                    heapq.heappush(self._best, (-scored.p, -scored.score, scored.order, self._count, scored))
+
+    def _top(self, heap):
+        while heap and self._scored.get(heap[0][-1].grouping) is not heap[0][-1]:
+            heapq.heappop(heap)
+        return heap[0][-1] if heap else None
+
+    def best(self):
+        """
+        Returns the grouping that a scan over possible_groupings keeping the
+        highest p, then the highest score, would choose, together with that p
+        and score and the table of the last grouping the scan looked at
+        """
+        stop, first = self._top(self._stops), self._top(self._first)
+        choice, highest_p, score = None, None, None
+        if first is not None and (stop is None or first.order < stop.order):
+            # a missing p in front of the scan is never replaced, later ones never win
+            best = first
+            if not isnan(first.p):
+                best = self._top(self._best)
+                if stop is not None and best.order > stop.order:
+                    best = min(
+                        (scored for scored in self._scored.values()
+                         if not scored.skip and not scored.stop and not isnan(scored.p) and scored.order < stop.order),
+                        key=lambda scored: (-scored.p, -scored.score, scored.order)
+                    )
+            choice, highest_p, score = best.grouping, best.p, best.score
+
+        if stop is not None:
+            return stop.grouping, highest_p, score, stop.table
+        return choice, highest_p, score, self._top(self._last).table
+
+    def merge(self, x, y):
+        """
+        Merges group y into group x of the variable and scores the groupings
+        x is now part of
+        """
+        self.ind_var.group(x, y)
+        for grouping in self._touching.pop(x, []) + self._touching.pop(y, []):
+            self._scored.pop(grouping, None)
+        self._push(self.ind_var.groupings_with(x))
+
+
 class Stats(object):
     """
     Stats class that determines the correct statistical method to apply
     """
-    def __init__(self, alpha_merge, min_child_node_size, split_threshold, dep_population, is_exhaustive=False):
+    def __init__(self, alpha_merge, min_child_node_size, split_threshold, dep_population, is_exhaustive=False,
+                 variance_test=None, n_jobs=1, parallel_backend='thread', parallel_node_size=10000):
+        if variance_test not in (None, 'bartlett', 'levene'):
+            raise ValueError('Unknown variance test ' + str(variance_test))
+        if parallel_backend not in ('thread', 'process'):
+            raise ValueError('Unknown parallel backend ' + str(parallel_backend))
         self.split_threshold = 1 - split_threshold
         self.alpha_merge = alpha_merge
         self.min_child_node_size = min_child_node_size
         self.dep_population = dep_population
         self.is_exhaustive = is_exhaustive
+        self._variance_test = variance_test
+        self.n_jobs = n_jobs
+        self.parallel_backend = parallel_backend
+        self.parallel_node_size = parallel_node_size
+        self._executor = None
+
+    @property
+    def variance_test(self):
+        """
+        The test comparing groups of a continuous dependent variable. Unless
+        forced, it is chosen once from a normality test of the population
+        """
+        if self._variance_test is None:
+            is_normal = stats.normaltest(self.dep_population)[1] > 0.05
+            self._variance_test = 'bartlett' if is_normal else 'levene'
+        return self._variance_test
 
     def best_split(self, ind, dep):
         """ determine which splitting function to apply """
@@ -54,12 +283,86 @@ class Stats(object):
         else:
             return self.best_cat_heuristic_split(ind, dep)
 
+    @contextmanager
+    def workers(self):
+        """
+        Opens a pool of n_jobs workers shared by the best_split calls made
+        inside. Nothing is opened for a single job. Processes are forked where
+        possible, so that they hash strings, and order sets of them, as this
+        process does
+        """
+        if self.n_jobs == 1 or self._executor is not None:
+            yield
+            return
+
+        if self.parallel_backend == 'thread':
+            pool = ThreadPoolExecutor(max_workers=self.n_jobs)
+        else:
+            context = get_context('fork') if 'fork' in get_all_start_methods() else None
+            pool = ProcessPoolExecutor(max_workers=self.n_jobs, mp_context=context)
+        with pool as executor:
+            self._executor = executor
+            try:
+                yield
+            finally:
+                self._executor = None
+
+    def __getstate__(self):
+        """
+        Leaves out the pool and the dependent population, which would
+        otherwise be sent to the process workers with every task. The
+        variance test is chosen before any task is dispatched
+        """
+        state = dict(self.__dict__)
+        state['_executor'] = None
+        state['dep_population'] = None
+        return state
+
+    def variable_splits(self, variable_split, ind, dep, *args):
+        """
+        Calls variable_split for every independent variable, on the open pool
+        of workers when the node has at least parallel_node_size rows. The
+        results are returned in the order of ind either way
+        """
+        calls = [(i, ind_var, dep) + args for i, ind_var in enumerate(ind)]
+        if self._executor is None or len(dep.arr) < self.parallel_node_size or len(calls) < 2:
+            return [variable_split(*call) for call in calls]
+        return list(self._executor.map(variable_split, *zip(*calls)))
+
+    def combine(self, split, i, invalid_reasons, temp_split):
+        """
+        Folds the outcome of variable i into the best split so far: the
+        invalid reasons it gave on the way, then its split if it has one.
+        Returns the new best split, carrying the surrogates
+        """
+        for invalid_reason in invalid_reasons:
+            split.invalid_reason = invalid_reason
+        if temp_split is None:
+            return split
+
+        better_split = not split.valid() or temp_split.p < split.p or (temp_split.p == split.p and temp_split.score > split.score)
+
+        if better_split:
+            split, temp_split = temp_split, split
+
+        score_threshold = self.split_threshold * split.score
+
+        if temp_split.valid() and temp_split.score >= score_threshold:
+            for sur in temp_split.surrogates:
+                if sur.column_id != i and sur.score >= score_threshold:
+                    split.surrogates.append(sur)
+
+            temp_split.surrogates = []
+            split.surrogates.append(temp_split)
+
+        return split
+
     def best_cat_heuristic_split(self, ind, dep):
         """ determine best categorical variable split using heuristic methods """
         split = Split(None, None, None, None, 0)
         min_child_node_size = self.min_child_node_size
 
-        all_dep = np.unique(dep.arr)
+        all_dep, dep_codes = np.unique(dep.arr, return_inverse=True)
         if len(all_dep) == 1:
             split.invalid_reason = InvalidSplitReason.PURE_NODE
             return split
@@ -72,188 +375,192 @@ class Stats(object):
             split.invalid_reason = InvalidSplitReason.PURE_NODE
             return split
 
-        for i, ind_var in enumerate(ind):
-            split.invalid_reason = None # must reset because using invalid reason to break
-            ind_var = ind_var.deep_copy()
-            unique = np.unique(ind_var.arr)
-
-            freq = {}
-            if dep.weights is None:
-                for col in unique:
-                    counts = np.unique(np.compress(ind_var.arr == col, dep.arr), return_counts=True)
-                    freq[col] = cl.defaultdict(int)
-                    freq[col].update(np.transpose(counts))
-            else:
-                for col in unique:
-                    counts = np.unique(np.compress(ind_var.arr == col, dep.arr), return_counts=True)
-                    freq[col] = cl.defaultdict(int)
-                    for dep_v in all_dep:
-                        freq[col][dep_v] = dep.weights[(ind_var.arr == col) * (dep.arr == dep_v)].sum()
-
+        # pairwise n_ij columns follow the iteration order of a set of dependent values,
+        # which decides the summation order of the chi-square
+        dep_values = all_dep.tolist()
+        dep_index = dict(zip(dep_values, range(len(dep_values))))
+        weighted_columns = [dep_index[k] for k in set(dep_values)]
 
-            if dep.weights is not None:
-                row_count = dep.weights.sum()
-            else:
-                row_count = len(dep.arr)
-
-            if len(list(ind_var.possible_groupings())) == 0:
-                split.invalid_reason = InvalidSplitReason.PURE_NODE
-            while next(ind_var.possible_groupings(), None) is not None:
-                choice, highest_p_join, split_chi = None, None, None
-
-                for comb in ind_var.possible_groupings():
-                    col1_freq = freq[comb[0]]
-                    col2_freq = freq[comb[1]]
-
-                    keys = set(col1_freq.keys()).union(col2_freq.keys())
-                    n_ij = np.array([
-                        [col1_freq.get(k, 0) for k in keys],
-                        [col2_freq.get(k, 0) for k in keys]
-                    ])
-
-                    # check to see if min_child_node_size permits this direction
-                    # 31 can't merge with 10 if it only leaves 27 for the other node(s)
-                    # but if these are the only two, can't skip, because the level can be defined
-                    # as these two nodes
-                    other_splits = row_count - n_ij.sum()
-                    if other_splits < min_child_node_size and other_splits != 0:
-                        p_split, dof, chi = 1, NaN, NaN
-                        continue
-
-                    if n_ij.shape[1] == 1:
-                        p_split, dof, chi = 1, NaN, NaN
-                        # could be the only valid combination, as we skip
-                        # ones that result in other nodes that give min child node sizes
-                        # this solves [[20], [10, 11]] even though 10 & 11 are exact,
-                        # this must be the choice of this iteration
-                        choice = comb
-                        break
-                    else:
-                        chi, p_split, dof = chisquare(n_ij, dep.weights is not None)
-
-                    if choice is None or p_split > highest_p_join or (p_split == highest_p_join and chi > split_chi):
-                        choice, highest_p_join, split_chi = comb, p_split, chi
-
-                sufficient_split = not highest_p_join or highest_p_join < self.alpha_merge
-                if not sufficient_split:
-                  split.invalid_reason = InvalidSplitReason.ALPHA_MERGE
-                elif (n_ij.sum(axis=1) < min_child_node_size).any():
-                  split.invalid_reason = InvalidSplitReason.MIN_CHILD_NODE_SIZE
-                elif self.is_exhaustive and len(freq.values()) > 2:
-                  split.invalid_reason = InvalidSplitReason.NODE_NOT_EXHAUSTIVE
-                else:
-                    n_ij = np.array([
-                        [f[dep_val] for dep_val in all_dep] for f in freq.values()
-                    ])
+        outcomes = self.variable_splits(self.cat_variable_split, ind, dep, dep_codes, dep_values, dep_index,
+                                        weighted_columns)
+        for i, (invalid_reasons, temp_split) in enumerate(outcomes):
+            split = self.combine(split, i, invalid_reasons, temp_split)
 
-                    dof = (n_ij.shape[0] - 1) * (n_ij.shape[1] - 1)
-                    chi, p_split, dof = chisquare(n_ij, dep.weights is not None)
+        if split.valid():
+            split.sub_split_values(ind[split.column_id].metadata)
+        return split
 
-                    temp_split = Split(i, ind_var.groups(), chi, p_split, dof, split_name=ind_var.name)
-                    better_split = not split.valid() or p_split < split.p or (p_split == split.p and chi > split.score)
+    def cat_variable_split(self, i, ind_var, dep, dep_codes, dep_values, dep_index, weighted_columns):
+        """
+        Merges the groups of one independent variable against a categorical
+        dependent variable. Returns the invalid reasons to give the best
+        split, in order, and the split of the variable or None
+        """
+        min_child_node_size = self.min_child_node_size
+        invalid_reasons = [None] # must reset because using invalid reason to break
 
-                    if better_split:
-                        split, temp_split = temp_split, split
+        ind_var = ind_var.deep_copy()
+        unique, ind_codes = np.unique(ind_var.arr, return_inverse=True)
 
-                    chi_threshold = self.split_threshold * split.score
+        # one row of freq per category, rows are added together as categories merge
+        freq = contingency_table(ind_codes, len(unique), dep_codes, len(dep_values), dep.weights)
+        rows = dict(zip(unique, range(len(unique))))
+        # dependent values seen in each category, in the order the category met them
+        present = {col: [dep_values[j] for j in np.flatnonzero(freq[row])] for col, row in rows.items()}
 
-                    if temp_split.valid() and temp_split.score >= chi_threshold:
-                        for sur in temp_split.surrogates:
-                            if sur.column_id != i and sur.score >= chi_threshold:
-                                split.surrogates.append(sur)
+        if dep.weights is not None:
+            row_count = dep.weights.sum()
+        else:
+            row_count = len(dep.arr)
+
+        def score_groupings(groupings):
+            tables, flags = [], []
+            for comb in groupings:
+                if dep.weights is None:
+                    # only the dependent values present in either category
+                    keys = set(present[comb[0]]).union(present[comb[1]])
+                    columns = [dep_index[k] for k in keys]
+                else:
+                    columns = weighted_columns
+                n_ij = freq.take([rows[comb[0]], rows[comb[1]]], axis=0).take(columns, axis=1)
+
+                # check to see if min_child_node_size permits this direction
+                # 31 can't merge with 10 if it only leaves 27 for the other node(s)
+                # but if these are the only two, can't skip, because the level can be defined
+                # as these two nodes
+                other_splits = row_count - n_ij.sum()
+                skip = other_splits < min_child_node_size and other_splits != 0
+
+                # could be the only valid combination, as we skip
+                # ones that result in other nodes that give min child node sizes
+                # this solves [[20], [10, 11]] even though 10 & 11 are exact,
+                # this must be the choice of this iteration
+                stop = not skip and n_ij.shape[1] == 1
+                tables.append(n_ij)
+                flags.append((skip, stop))
+
+            # the pairs that compete on p are scored together
+            competing = [n_ij for n_ij, (skip, stop) in zip(tables, flags) if not skip and not stop]
+            scores = iter(chisquare_batch(competing, dep.weights is not None))
+            return [
+                (None, None, n_ij, skip, stop) if skip or stop else next(scores)[:2] + (n_ij, skip, stop)
+                for n_ij, (skip, stop) in zip(tables, flags)
+            ]
+
+        if len(list(ind_var.possible_groupings())) == 0:
+            invalid_reasons.append(InvalidSplitReason.PURE_NODE)
+        merges = MergeQueue(ind_var, score_groupings)
+        while next(ind_var.possible_groupings(), None) is not None:
+            choice, highest_p_join, split_chi, n_ij = merges.best()
+
+            sufficient_split = not highest_p_join or highest_p_join < self.alpha_merge
+            if not sufficient_split:
+              invalid_reasons.append(InvalidSplitReason.ALPHA_MERGE)
+            elif (n_ij.sum(axis=1) < min_child_node_size).any():
+              invalid_reasons.append(InvalidSplitReason.MIN_CHILD_NODE_SIZE)
+            elif self.is_exhaustive and len(rows) > 2:
+              invalid_reasons.append(InvalidSplitReason.NODE_NOT_EXHAUSTIVE)
+            else:
+                n_ij = freq[list(rows.values())]
 
-                        temp_split.surrogates = []
-                        split.surrogates.append(temp_split)
+                dof = (n_ij.shape[0] - 1) * (n_ij.shape[1] - 1)
+                chi, p_split, dof = chisquare(n_ij, dep.weights is not None)
 
-                    break
+                return invalid_reasons, Split(i, ind_var.groups(), chi, p_split, dof, split_name=ind_var.name)
 
-                # all combinations created don't suffice. i.e. what's left is below min_child_node_size
-                if choice is None:
-                    break
-                else:
-                    ind_var.group(choice[0], choice[1])
-                    for val, count in freq[choice[1]].items():
-                        freq[choice[0]][val] += count
-                    del freq[choice[1]]
-        if split.valid():
-            split.sub_split_values(ind[split.column_id].metadata)
-        return split
+            # all combinations created don't suffice. i.e. what's left is below min_child_node_size
+            if choice is None:
+                break
+            else:
+                freq[rows[choice[0]]] += freq[rows[choice[1]]]
+                del rows[choice[1]]
+                merged = set(present[choice[0]])
+                present[choice[0]] += [k for k in present.pop(choice[1]) if k not in merged]
+                merges.merge(choice[0], choice[1])
+        return invalid_reasons, None
 
     def best_con_split(self, ind, dep):
         """ determine best continuous variable split """
         split = Split(None, None, None, None, 0)
-        is_normal = stats.normaltest(self.dep_population)[1] > 0.05
-        sig_test = stats.bartlett if is_normal else stats.levene
+        if self.variance_test == 'bartlett':
+            group_statistics, sig_test = bartlett_statistics, bartlett_from_statistics
+            merge_statistics = bartlett_merge_statistics
+        else:
+            group_statistics, sig_test = levene_statistics, levene_from_statistics
+            merge_statistics = None
         response_set = dep.arr
         if dep.weights is not None:
-            response_set = dep.arr * dep.weights
-
-        for i, ind_var in enumerate(ind):
-            ind_var = ind_var.deep_copy()
-            unique = np.unique(ind_var.arr)
-            keyed_set = {}
-
-            for col in unique:
-                matched_elements = np.compress(ind_var.arr == col, response_set)
-                keyed_set[col] = matched_elements
-
-            while next(ind_var.possible_groupings(), None) is not None:
-                choice, highest_p_join, split_score = None, None, None
-                for comb in ind_var.possible_groupings():
-                    col1_keyed_set = keyed_set[comb[0]]
-                    col2_keyed_set = keyed_set[comb[1]]
-                    dof = len(np.concatenate((col1_keyed_set, col2_keyed_set))) - 2
-                    score, p_split = sig_test(col1_keyed_set, col2_keyed_set)
-
-                    if choice is None or p_split > highest_p_join or (p_split == highest_p_join and score > split_score):
-                        choice, highest_p_join, split_score = comb, p_split, score
-
-                sufficient_split = highest_p_join < self.alpha_merge and all(
-                    len(node_v) >= self.min_child_node_size for node_v in keyed_set.values()
-                )
-
-                invalid_reason = None
-                sufficient_split = highest_p_join < self.alpha_merge
-                if not sufficient_split: invalid_reason = InvalidSplitReason.ALPHA_MERGE
-
-                sufficient_split = sufficient_split and all(
-                    len(node_v) >= self.min_child_node_size for node_v in keyed_set.values()
-                )
-                
-                if not sufficient_split: 
-                    split.invalid_reason = InvalidSplitReason.MIN_CHILD_NODE_SIZE
-                elif self.is_exhaustive and len(list(ind_var.possible_groupings())) != 1: 
-                    invalid_reason = InvalidSplitReason.NODE_NOT_EXHAUSTIVE
-                elif sufficient_split and len(keyed_set.values()) > 1:
-                    dof = len(np.concatenate(list(keyed_set.values()))) - 2
-                    score, p_split = sig_test(*keyed_set.values())
-
-                    temp_split = Split(i, ind_var.groups(), score, p_split, dof, split_name=ind_var.name)
-
-                    better_split = not split.valid() or p_split < split.p or (p_split == split.p and score > split.score)
-
-                    if better_split:
-                        split, temp_split = temp_split, split
-
-                    score_threshold = self.split_threshold * split.score
-
-                    if temp_split.valid() and temp_split.score >= score_threshold:
-                        for sur in temp_split.surrogates:
-                            if sur.column_id != i and sur.score >= score_threshold:
-                                split.surrogates.append(sur)
-
-                        temp_split.surrogates = []
-                        split.surrogates.append(temp_split)
-
-                    break
-                else:
-                    split.invalid_reason = invalid_reason
+            response_set = dep.arr * np.asarray(dep.weights)
 
-                ind_var.group(choice[0], choice[1])
-
-                keyed_set[choice[0]] = np.concatenate((keyed_set[choice[1]], keyed_set[choice[0]]))
-                del keyed_set[choice[1]]
+        outcomes = self.variable_splits(self.con_variable_split, ind, dep, response_set, group_statistics, sig_test,
+                                        merge_statistics)
+        for i, (invalid_reasons, temp_split) in enumerate(outcomes):
+            split = self.combine(split, i, invalid_reasons, temp_split)
 
         if split.valid():
             split.sub_split_values(ind[split.column_id].metadata)
         return split
+
+    def con_variable_split(self, i, ind_var, dep, response_set, group_statistics, sig_test, merge_statistics):
+        """
+        Merges the groups of one independent variable against a continuous
+        dependent variable. Returns the invalid reasons to give the best
+        split, in order, and the split of the variable or None.
+        merge_statistics combines the statistics of two groups; without it,
+        as for the median-centred Levene test, a merged group is rescanned
+        """
+        invalid_reasons = []
+
+        ind_var = ind_var.deep_copy()
+        unique, inverse = np.unique(ind_var.arr, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        matched_elements = np.split(response_set[order], np.cumsum(np.bincount(inverse))[:-1])
+        keyed_set = dict(zip(unique, matched_elements))
+        keyed_statistics = {col: group_statistics(values) for col, values in keyed_set.items()}
+        if merge_statistics is not None: keyed_set = None
+
+        def score_groupings(groupings):
+            return [
+                sig_test([keyed_statistics[comb[0]], keyed_statistics[comb[1]]]) + (None, False, False)
+                for comb in groupings
+            ]
+
+        merges = MergeQueue(ind_var, score_groupings)
+        while next(ind_var.possible_groupings(), None) is not None:
+            choice, highest_p_join, split_score, _ = merges.best()
+
+            sufficient_split = highest_p_join < self.alpha_merge and all(
+                statistics[0] >= self.min_child_node_size for statistics in keyed_statistics.values()
+            )
+
+            invalid_reason = None
+            sufficient_split = highest_p_join < self.alpha_merge
+            if not sufficient_split: invalid_reason = InvalidSplitReason.ALPHA_MERGE
+
+            sufficient_split = sufficient_split and all(
+                statistics[0] >= self.min_child_node_size for statistics in keyed_statistics.values()
+            )
+            
+            if not sufficient_split: 
+                invalid_reasons.append(InvalidSplitReason.MIN_CHILD_NODE_SIZE)
+            elif self.is_exhaustive and len(list(ind_var.possible_groupings())) != 1: 
+                invalid_reason = InvalidSplitReason.NODE_NOT_EXHAUSTIVE
+            elif sufficient_split and len(keyed_statistics) > 1:
+                dof = sum(statistics[0] for statistics in keyed_statistics.values()) - 2
+                score, p_split = sig_test(list(keyed_statistics.values()))
+
+                return invalid_reasons, Split(i, ind_var.groups(), score, p_split, dof, split_name=ind_var.name)
+            else:
+                invalid_reasons.append(invalid_reason)
+
+            if merge_statistics is not None:
+                keyed_statistics[choice[0]] = merge_statistics(keyed_statistics[choice[1]], keyed_statistics[choice[0]])
+            else:
+                # the median of the merged group cannot be derived from the statistics of its parts
+                keyed_set[choice[0]] = np.concatenate((keyed_set[choice[1]], keyed_set[choice[0]]))
+                keyed_statistics[choice[0]] = group_statistics(keyed_set[choice[0]])
+                del keyed_set[choice[1]]
+            del keyed_statistics[choice[1]]
+            merges.merge(choice[0], choice[1])
+
+        return invalid_reasons, None
@@ -25,7 +25,11 @@ class Tree(object):
                 min_parent_node_size=30,
                 min_child_node_size=30,
                 split_threshold=0,
-                is_exhaustive=False
+                is_exhaustive=False,
+                variance_test=None,
+                n_jobs=1,
+                parallel_backend='thread',
+                parallel_node_size=10000
             }
         """
         self.max_depth = config.get('max_depth', 2)
@@ -40,13 +44,18 @@ class Tree(object):
             config.get('min_child_node_size', 30),
             config.get('split_threshold', 0),
             dependent_column.arr,
-            config.get('is_exhaustive', False)
+            config.get('is_exhaustive', False),
+            config.get('variance_test'),
+            config.get('n_jobs', 1),
+            config.get('parallel_backend', 'thread'),
+            config.get('parallel_node_size', 10000)
         )
 
     @staticmethod
     def from_numpy(ndarr, arr, alpha_merge=0.05, max_depth=2, min_parent_node_size=30,
                  min_child_node_size=30, split_titles=None, split_threshold=0, weights=None,
-                 variable_types=None, dep_variable_type='categorical', is_exhaustive=False):
+                 variable_types=None, dep_variable_type='categorical', is_exhaustive=False,
+                 variance_test=None, n_jobs=1, parallel_backend='thread', parallel_node_size=10000):
         """
         Create a CHAID object from numpy
 
@@ -73,20 +82,44 @@ class Tree(object):
             array of variable types, or dict of column names to variable types.
             Supported variable types are the strings 'nominal' or 'ordinal' in
             lower case
+        variance_test : str or None
+            the test comparing groups of a continuous dependent variable, 'bartlett'
+            or 'levene'. If None, bartlett is used when the dependent variable passes
+            a normality test and levene otherwise (default None)
+        n_jobs : int or None
+            the number of workers evaluating the independent variables of a node
+            in parallel. None uses as many as the pool allows (default 1)
+        parallel_backend : str
+            the pool of workers, 'thread' or 'process' (default 'thread')
+        parallel_node_size : int
+            nodes with fewer rows evaluate their variables serially (default 10000)
         """
         vectorised_array = []
         variable_types = variable_types or ['nominal'] * ndarr.shape[1]
         for ind, col_type in enumerate(variable_types):
             title = None
             if split_titles is not None: title = split_titles[ind]
-            if col_type == 'ordinal':
-                col = OrdinalColumn(ndarr[:, ind], name=title)
-            elif col_type == 'nominal':
-                col = NominalColumn(ndarr[:, ind], name=title)
-            else:
-                raise NotImplementedError('Unknown independent variable type ' + col_type)
-            vectorised_array.append(col)
+            vectorised_array.append(Tree._column(ndarr[:, ind], col_type, title))
+
+        return Tree.from_columns(vectorised_array, arr, alpha_merge, max_depth, min_parent_node_size,
+                                 min_child_node_size, split_threshold, weights, dep_variable_type, is_exhaustive,
+                                 variance_test, n_jobs, parallel_backend, parallel_node_size)
 
+    @staticmethod
+    def from_columns(vectorised_array, arr, alpha_merge=0.05, max_depth=2, min_parent_node_size=30,
+                     min_child_node_size=30, split_threshold=0, weights=None,
+                     dep_variable_type='categorical', is_exhaustive=False, variance_test=None,
+                     n_jobs=1, parallel_backend='thread', parallel_node_size=10000):
+        """
+        Create a CHAID object from already constructed independent columns
+
+        Parameters
+        ----------
+        vectorised_array : array<Column>
+            the independent variables as CHAID columns
+        arr : numpy.ndarray
+            1-dimensional array of the dependent variable
+        """
         if dep_variable_type == 'categorical':
             observed = NominalColumn(arr, weights=weights)
         elif dep_variable_type == 'continuous':
@@ -95,13 +128,15 @@ class Tree(object):
             raise NotImplementedError('Unknown dependent variable type ' + dep_variable_type)
         config = { 'alpha_merge': alpha_merge, 'max_depth': max_depth, 'min_parent_node_size': min_parent_node_size,
                    'min_child_node_size': min_child_node_size, 'split_threshold': split_threshold,
-                   'is_exhaustive': is_exhaustive }
+                   'is_exhaustive': is_exhaustive, 'variance_test': variance_test, 'n_jobs': n_jobs,
+                   'parallel_backend': parallel_backend, 'parallel_node_size': parallel_node_size }
         return Tree(vectorised_array, observed, config)
 
     def build_tree(self):
         """ Build chaid tree """
         self._tree_store = []
-        self.node(np.arange(0, self.data_size, dtype=np.int), self.vectorised_array, self.observed)
+        with self._stats.workers():
+            self.node(np.arange(0, self.data_size, dtype=np.int), self.vectorised_array, self.observed)
 
     @property
     def tree_store(self):
@@ -109,13 +144,19 @@ class Tree(object):
             self.build_tree()
         return self._tree_store
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stats.dep_population = self.observed.arr
+
     @staticmethod
     def from_pandas_df(df, i_variables, d_variable, alpha_merge=0.05, max_depth=2,
                        min_parent_node_size=30, min_child_node_size=30, split_threshold=0,
-                       weight=None, dep_variable_type='categorical', is_exhaustive=False):
+                       weight=None, dep_variable_type='categorical', is_exhaustive=False,
+                       variance_test=None, n_jobs=1, parallel_backend='thread', parallel_node_size=10000):
         """
         Helper method to pre-process a pandas data frame in order to run CHAID
-        analysis
+        analysis. Nominal variables of categorical dtype are built from their
+        codes and categories instead of being substituted again
 
         Parameters
         ----------
@@ -146,14 +187,47 @@ class Tree(object):
         dep_variable_type : str
             the type of dependent variable. Supported variable types are 'categorical' or
             'continuous'
+        variance_test : str or None
+            the test comparing groups of a continuous dependent variable, 'bartlett'
+            or 'levene'. If None, bartlett is used when the dependent variable passes
+            a normality test and levene otherwise (default None)
+        n_jobs : int or None
+            the number of workers evaluating the independent variables of a node
+            in parallel. None uses as many as the pool allows (default 1)
+        parallel_backend : str
+            the pool of workers, 'thread' or 'process' (default 'thread')
+        parallel_node_size : int
+            nodes with fewer rows evaluate their variables serially (default 10000)
         """
         ind_df = df[list(i_variables.keys())]
-        ind_values = ind_df.values
         dep_values = df[d_variable].values
         weights = df[weight] if weight is not None else None
-        return Tree.from_numpy(ind_values, dep_values, alpha_merge, max_depth, min_parent_node_size,
-                    min_child_node_size, list(ind_df.columns.values), split_threshold, weights,
-                    list(i_variables.values()), dep_variable_type, is_exhaustive)
+        if not any(dtype.name == 'category' for dtype in ind_df.dtypes):
+            return Tree.from_numpy(ind_df.values, dep_values, alpha_merge, max_depth, min_parent_node_size,
+                        min_child_node_size, list(ind_df.columns.values), split_threshold, weights,
+                        list(i_variables.values()), dep_variable_type, is_exhaustive, variance_test,
+                        n_jobs, parallel_backend, parallel_node_size)
+
+        vectorised_array = []
+        for title, col_type in i_variables.items():
+            values = ind_df[title]
+            if col_type == 'nominal' and values.dtype.name == 'category':
+                col = NominalColumn.from_categorical(values.cat.codes.values, values.cat.categories, name=title)
+            else:
+                col = Tree._column(values.to_numpy(dtype=object), col_type, title)
+            vectorised_array.append(col)
+        return Tree.from_columns(vectorised_array, dep_values, alpha_merge, max_depth, min_parent_node_size,
+                                 min_child_node_size, split_threshold, weights, dep_variable_type, is_exhaustive,
+                                 variance_test, n_jobs, parallel_backend, parallel_node_size)
+
+    @staticmethod
+    def _column(values, col_type, title):
+        if col_type == 'ordinal':
+            return OrdinalColumn(values, name=title)
+        elif col_type == 'nominal':
+            return NominalColumn(values, name=title)
+        else:
+            raise NotImplementedError('Unknown independent variable type ' + col_type)
 
     def node(self, rows, ind, dep, depth=0, parent=None, parent_decisions=None):
         """ internal method to create a node in the tree """
@@ -180,7 +254,7 @@ class Tree(object):
             return self._tree_store
 
         for index, choices in enumerate(split.splits):
-            correct_rows = np.in1d(ind[split.column_id].arr, choices)
+            correct_rows = np.flatnonzero(np.in1d(ind[split.column_id].arr, choices))
             dep_slice = dep[correct_rows]
             ind_slice = [vect[correct_rows] for vect in ind]
             row_slice = rows[correct_rows]
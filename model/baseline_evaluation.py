@@ -50,6 +50,8 @@ def evaluate(tree, test_df, gm_column_name="gm"):
 from dataframe import *
 from baseline import BaselineSegmentationTree
 
+df, _ = load_dataset()
+
 kf = KFold(n_splits = 5, shuffle = True)
 for result in kf.split(df):
     train_df = df.iloc[result[0]].reset_index(drop=True)
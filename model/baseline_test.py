@@ -3,6 +3,8 @@ import numpy as np
 from dataframe import *
 from baseline import BaselineSegmentationTree, BaselineSegmentationTreeVisualizer
 
+df, _ = load_dataset()
+
 features_list = [manufacturing_region, product_family]
 N = 250
 
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 3
+META_FILE = "meta.pkl"
+
+
+def cache_key(path, settings):
+    digest = hashlib.sha1(repr((CACHE_VERSION, settings)).encode())
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_frame(df, path, metadata=None):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            kind = ("category", list(values.cat.categories), values.cat.ordered)
+            arr = values.cat.codes.to_numpy()
+        elif values.dtype == object:
+            codes, uniques = pd.factorize(values)
+            kind = ("object", list(uniques))
+            arr = codes.astype(np.int32)
+        else:
+            kind = ("array",)
+            arr = values.to_numpy()
+        np.save(os.path.join(tmp_path, f"{i}.npy"), arr)
+        columns.append((col, kind))
+
+    with open(os.path.join(tmp_path, META_FILE), 'wb') as handle:
+        pickle.dump((columns, metadata), handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_frame(path):
+    with open(os.path.join(path, META_FILE), 'rb') as handle:
+        columns, metadata = pickle.load(handle)
+
+    # numeric columns and categorical codes stay backed by the copy-on-write mappings,
+    # object columns are decoded into memory
+    data = {}
+    for i, (col, kind) in enumerate(columns):
+        arr = np.load(os.path.join(path, f"{i}.npy"), mmap_mode='c')
+        if kind[0] == "category":
+            data[col] = pd.Categorical.from_codes(arr, categories=kind[1], ordered=kind[2])
+        elif kind[0] == "object":
+            data[col] = np.array(kind[1] + [np.nan], dtype=object)[arr]
+        else:
+            data[col] = arr
+    return pd.DataFrame(data, copy=False), metadata
+
+
+def cached(path, compute):
+    if os.path.isfile(os.path.join(path, META_FILE)):
+        return load_frame(path)
+
+    df, metadata = compute()
+    save_frame(df, path, metadata)
+    return df, metadata
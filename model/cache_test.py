@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from cache import load_frame, save_frame
+
+
+def is_memory_mapped(arr):
+    while arr is not None:
+        if isinstance(arr, np.memmap):
+            return True
+        arr = arr.base
+    return False
+
+
+def test_load_frame_keeps_columns_memory_mapped(tmp_path):
+    df = pd.DataFrame({
+        "region": pd.Categorical(["Asia", None, "Europe", "Asia"]),
+        "bucket": pd.Categorical(["a", "b", "b", "a"], categories=["b", "a"], ordered=True),
+        "gm": [0.25, 0.5, np.nan, 0.75],
+        "rows": np.arange(4),
+        "label": ["x", None, "y", "x"],
+    })
+    save_frame(df, str(tmp_path / "frame"), metadata={"version": 1})
+
+    loaded, metadata = load_frame(str(tmp_path / "frame"))
+
+    pd.testing.assert_frame_equal(loaded, df)
+    assert metadata == {"version": 1}
+    assert is_memory_mapped(loaded["gm"].to_numpy())
+    assert is_memory_mapped(loaded["rows"].to_numpy())
+    assert is_memory_mapped(loaded["region"].cat.codes.to_numpy())
+    assert is_memory_mapped(loaded["bucket"].cat.codes.to_numpy())
+
+
+def test_loaded_frame_is_writable_without_touching_the_cache(tmp_path):
+    df = pd.DataFrame({"gm": [0.25, 0.5, 0.75]})
+    save_frame(df, str(tmp_path / "frame"))
+
+    loaded, _ = load_frame(str(tmp_path / "frame"))
+    loaded.loc[0, "gm"] = 1.0
+
+    assert load_frame(str(tmp_path / "frame"))[0].loc[0, "gm"] == 0.25
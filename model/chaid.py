@@ -1,3 +1,8 @@
+import copy
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 from graphviz import Digraph
@@ -7,22 +12,24 @@ from CHAID import Tree
 
 class Segment:
     
-    def __init__(self, segment_id, leaf, supernode_pairs, segment_pairs, segment_df, gm_cutoffs):
+    def __init__(self, segment_id, leaf, supernode_pairs, segment_pairs, indices, gm_cutoffs):
         self.segment_id = segment_id
         self.leaf = leaf
         self.supernode_pairs = supernode_pairs
         self.segment_pairs = segment_pairs
-        self.segment_df = segment_df
+        self.indices = indices
         self.gm_cutoffs = gm_cutoffs
         self.duplicates = len(self.gm_cutoffs) < 6
+        self.rows_count = len(indices)
         
     @property
     def is_problematic(self):
         return self.duplicates
         
-    @property
-    def rows_count(self):
-        return len(self.segment_df)
+    def lean(self):
+        segment = copy.copy(self)
+        segment.indices = None
+        return segment
 
     def __str__(self):
         cutoffs = ', '.join(f"{v:.3f}" for v in self.gm_cutoffs)
@@ -36,7 +43,8 @@ class SuperCHAID:
     def __init__(self, supernode_features, features_list, dependant_variable, verbose=True,
                  alpha_merge=0.08, max_depth=3,
                  min_parent_node_size=5000, min_child_node_size=250,
-                 split_threshold=0, is_exhaustive=False):
+                 split_threshold=0, is_exhaustive=False, variance_test=None, n_jobs=1,
+                 split_n_jobs=1, split_backend="thread"):
         self.supernode_features = supernode_features
         self.features_list = features_list
         self.dependant_variable = dependant_variable
@@ -47,43 +55,39 @@ class SuperCHAID:
         self.min_child_node_size = min_child_node_size
         self.split_threshold = split_threshold
         self.is_exhaustive = is_exhaustive
+        self.variance_test = variance_test
+        self.n_jobs = self._check_jobs(n_jobs)
+        self.split_n_jobs = self._check_split_jobs(split_n_jobs)
+        self.split_backend = self._check_split_backend(split_backend)
         self.id_counter = 0
+        self.routing_table = None
         
     def fit(self, df):
         self.trees = {}
+        supernodes = []
         
-        for supernode_values in self._determine_supernode_values_list(df):
-            supernode_df = df
-            supernode_pairs = dict(zip(self.supernode_features, supernode_values))
+        for supernode_values, rows in self._determine_supernode_rows(df):
+            supernodes.append((supernode_values, df.iloc[rows].reset_index(drop=True)))
             
-            for i, supernode_feature in enumerate(self.supernode_features):
-                supernode_df = supernode_df[supernode_df[supernode_feature] == supernode_values[i]]
-            supernode_df = supernode_df.reset_index(drop=True)
-            if len(supernode_df) == 0: continue
-
-            tree = self._fit_tree(supernode_df)
+        fitted_trees = self._fit_trees([supernode_df for _, supernode_df in supernodes])
+        for (supernode_values, supernode_df), tree in zip(supernodes, fitted_trees):
+            supernode_pairs = dict(zip(self.supernode_features, supernode_values))
             tree.supernode_pairs = supernode_pairs
             tree.supernode_df = supernode_df
             tree.segments = []
+            dependant_values = supernode_df[self.dependant_variable].to_numpy()
             
             for leaf in tree.classification_rules():
-                segment_df = supernode_df
                 segment_pairs = {}
-                
                 for variable_data_pair in leaf['rules']:
-                    variable = variable_data_pair['variable']
-                    data = variable_data_pair['data']
-                    segment_pairs[variable] = data
-                    filter = np.zeros(len(segment_df), dtype=bool)
-                    for value in data:
-                        filter |= segment_df[variable] == value
-                    segment_df = segment_df[filter].reset_index(drop=True)
+                    segment_pairs[variable_data_pair['variable']] = variable_data_pair['data']
                     
-                gm_cutoffs = self._determine_gm_cutoffs(segment_df)
-                segment = self._create_segment(leaf, supernode_pairs, segment_pairs, segment_df, gm_cutoffs)
+                indices = tree.get_node(leaf['node']).indices
+                gm_cutoffs = self._determine_gm_cutoffs(dependant_values[indices])
+                segment = self._create_segment(leaf, supernode_pairs, segment_pairs, indices, gm_cutoffs)
                 tree.segments.append(segment)
                 
-            tree.root = self._rebuild(tree, supernode_df, {}, tree.tree_store[0])
+            tree.root = self._rebuild(tree, {}, tree.tree_store[0])
             self.trees[supernode_values] = tree
             
             if self.verbose:
@@ -93,6 +97,8 @@ class SuperCHAID:
                 for segment in tree.segments:
                     print(f"    {segment}")
                 print()
+                
+        self.compile()
 
     def predict(self, input_row, impute=True):
         input_row = input_row.copy()
@@ -114,16 +120,28 @@ class SuperCHAID:
             else:
                 if not impute: break
                 
-                max_child = max(current_node.children.values(), key=lambda c: len(c.df))
-                max_value = max(max_child.choices, key=lambda v: sum(max_child.df[variable] == v))
-                value = max_value
+                value = current_node.fallback_value
                 imputed_pairs[variable] = value
                 input_row[variable] = value
             segment_pairs[variable] = value
 
+        if not current_node.is_terminal: return None
+        
         for segment in tree.segments:
-            if self._belongs_to_segment(input_row, segment):
+            if segment.leaf['node'] == current_node.node_id:
                 return segment, segment_pairs, imputed_pairs
+
+    def predict_batch(self, df, impute=True):
+        if self.routing_table is None: self.compile()
+        return self.routing_table.predict_batch(df, impute)
+        
+    def compile(self):
+        self.routing_table = RoutingTable(self)
+        return self.routing_table
+        
+    def export(self, path):
+        if self.routing_table is None: self.compile()
+        self.routing_table.save(path)
                 
     @property
     def is_singleton(self):
@@ -133,20 +151,56 @@ class SuperCHAID:
     def singleton(self):
         return self.trees[SuperCHAID.SINGLETON_KEY]
 
-    def _determine_supernode_values_list(self, df):
-        if self.is_singleton: return [SuperCHAID.SINGLETON_KEY]
+    def _determine_supernode_rows(self, df):
+        if self.is_singleton: return [(SuperCHAID.SINGLETON_KEY, np.arange(len(df)))]
 
-        supernode_values_list = []
-        history = set()
-        for v in df[self.supernode_features].values:
-            v = tuple(v)
-            if v not in history:
-                history.add(v)
-                supernode_values_list.append(v)
-        return supernode_values_list
+        grouped = df.groupby(self.supernode_features, sort=False, observed=True)
+        groups = grouped.ngroup().to_numpy()
+        order = np.argsort(groups, kind="stable")
+        bounds = np.searchsorted(groups[order], np.arange(grouped.ngroups + 1))
+        
+        supernode_rows = []
+        for group in range(grouped.ngroups):
+            rows = order[bounds[group]:bounds[group + 1]]
+            if len(rows) == 0: continue
+            supernode_rows.append((tuple(df[self.supernode_features].iloc[rows[0]]), rows))
+        return supernode_rows
+        
+    @staticmethod
+    def _is_positive_integer(n_jobs):
+        return isinstance(n_jobs, (int, np.integer)) and not isinstance(n_jobs, bool) and n_jobs >= 1
+
+    @staticmethod
+    def _check_jobs(n_jobs):
+        if n_jobs is None or (not isinstance(n_jobs, bool) and n_jobs == -1): return n_jobs
+        if not SuperCHAID._is_positive_integer(n_jobs):
+            raise ValueError(f"n_jobs must be a positive integer, or -1 or None to use all cores, got {n_jobs!r}")
+        return n_jobs
+
+    @staticmethod
+    def _check_split_jobs(split_n_jobs):
+        if split_n_jobs is None: return split_n_jobs
+        if not SuperCHAID._is_positive_integer(split_n_jobs):
+            raise ValueError(f"split_n_jobs must be a positive integer, or None to use the default pool size, "
+                             f"got {split_n_jobs!r}")
+        return split_n_jobs
+
+    @staticmethod
+    def _check_split_backend(split_backend):
+        if split_backend not in ("thread", "process"):
+            raise ValueError(f"split_backend must be 'thread' or 'process', got {split_backend!r}")
+        return split_backend
+
+    def _fit_trees(self, supernode_dfs):
+        n_jobs = (os.cpu_count() or 1) if self.n_jobs in (None, -1) else self.n_jobs
+        if n_jobs == 1: return [self._fit_tree(supernode_df) for supernode_df in supernode_dfs]
+        
+        columns = self.features_list + [self.dependant_variable]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            return list(executor.map(self._fit_tree, [supernode_df[columns] for supernode_df in supernode_dfs]))
         
     def _fit_tree(self, supernode_df):
-        return Tree.from_pandas_df(
+        tree = Tree.from_pandas_df(
           supernode_df,
           dict(zip(self.features_list, ["nominal"] * len(self.features_list))),
           self.dependant_variable,
@@ -156,30 +210,36 @@ class SuperCHAID:
           min_parent_node_size=self.min_parent_node_size,
           min_child_node_size=self.min_child_node_size,
           split_threshold=self.split_threshold,
-          is_exhaustive=self.is_exhaustive
+          is_exhaustive=self.is_exhaustive,
+          variance_test=self.variance_test,
+          n_jobs=self.split_n_jobs,
+          parallel_backend=self.split_backend
         )
+        tree.build_tree()
+        return tree
         
-    def _create_segment(self, leaf, supernode_pairs, segment_pairs, segment_df, gm_cutoffs):
+    def _create_segment(self, leaf, supernode_pairs, segment_pairs, indices, gm_cutoffs):
         segment_id = self.id_counter
         self.id_counter += 1
-        return Segment(segment_id, leaf, supernode_pairs, segment_pairs, segment_df, gm_cutoffs)
+        return Segment(segment_id, leaf, supernode_pairs, segment_pairs, indices, gm_cutoffs)
 
-    def _rebuild(self, tree, df, pairs, node):
-        node.df = df
+    def _rebuild(self, tree, pairs, node):
         node.children = {}
         node.pairs = pairs
         
         variable = node.split.column
         for child in [c for c in tree.tree_store if c.parent == node.node_id]:
             values = child.choices
-            filter = np.zeros(len(df), dtype=bool)
-            for value in values:
-                filter |= df[variable] == value
-            new_df = df[filter].reset_index(drop=True)
             pairs = pairs.copy()
             pairs[variable] = values
             child.value = ', '.join([str(v) for v in values])
-            node.children[child.node_id] = self._rebuild(tree, new_df, pairs, child)
+            node.children[child.node_id] = self._rebuild(tree, pairs, child)
+            
+        node.fallback_child, node.fallback_value = None, None
+        if node.children:
+            node.fallback_child = max(node.children.values(), key=lambda c: len(c.indices))
+            counts = tree.supernode_df[variable].iloc[node.fallback_child.indices].value_counts()
+            node.fallback_value = max(node.fallback_child.choices, key=lambda v: counts.get(v, 0))
         return node
         
     def _get_tree(self, input_row):
@@ -193,9 +253,8 @@ class SuperCHAID:
             tree = self.trees[key] if key in self.trees else None
         return tree
         
-    def _determine_gm_cutoffs(self, segment_df, impute=True):
-        segment_df_dependant_variable = segment_df[self.dependant_variable].sort_values()
-        _, bins = pd.qcut(segment_df_dependant_variable, q=[0, .2, .4, .6, .8, 1], retbins=True, duplicates="drop")
+    def _determine_gm_cutoffs(self, dependant_values, impute=True):
+        _, bins = pd.qcut(np.sort(dependant_values), q=[0, .2, .4, .6, .8, 1], retbins=True, duplicates="drop")
         bins = list(bins)
         if impute and len(bins) > 1:
             while len(bins) < 6:
@@ -209,16 +268,182 @@ class SuperCHAID:
                 bins.insert(max_index+1, (bins[max_index] + bins[max_index+1]) / 2)
         return bins
         
-    def _belongs_to_segment(self, input_row, segment):
-        for key, values in segment.segment_pairs.items():
-            if self._get_value(input_row, key) not in values: return False
-        return True
-        
     def _get_value(self, input_row, key):
         value = input_row[key]
         return value if str(value) != "nan" else '<missing>'
         
         
+class RoutingTable:
+
+    MISSING = -1
+
+    def __init__(self, super_tree):
+        self.supernode_features = list(super_tree.supernode_features)
+        self.tree_keys = list(super_tree.trees.keys())
+        self.features = []
+        self.vocabularies = []
+        
+        nodes = []
+        roots = []
+        for tree in super_tree.trees.values():
+            offset = len(nodes)
+            roots.append(offset + tree.root.node_id)
+            leaves = {segment.leaf['node']: segment for segment in tree.segments}
+            nodes.extend((offset, node, leaves.get(node.node_id)) for node in tree.tree_store)
+            for node in tree.tree_store:
+                if node.is_terminal: continue
+                vocabulary = self._vocabulary(node.split.column)
+                for child in node.children.values():
+                    vocabulary.update((value, None) for value in child.choices)
+        self.vocabularies = [pd.Index(list(vocabulary)) for vocabulary in self.vocabularies]
+        
+        self.roots = np.array(roots, dtype=int)
+        self.tree_roots = dict(zip(self.tree_keys, roots))
+        self.node_feature = np.full(len(nodes), RoutingTable.MISSING, dtype=int)
+        self.node_offset = np.zeros(len(nodes), dtype=int)
+        self.node_segment = np.full(len(nodes), RoutingTable.MISSING, dtype=int)
+        self.node_fallback_child = np.full(len(nodes), RoutingTable.MISSING, dtype=int)
+        self.node_fallback_code = np.full(len(nodes), RoutingTable.MISSING, dtype=int)
+        lookup = []
+        lookup_size = 0
+        
+        for i, (offset, node, segment) in enumerate(nodes):
+            if node.is_terminal:
+                self.node_segment[i] = segment.segment_id
+                continue
+            
+            feature = self.features.index(node.split.column)
+            vocabulary = self.vocabularies[feature]
+            children = np.full(len(vocabulary), RoutingTable.MISSING, dtype=int)
+            for child in reversed(list(node.children.values())):
+                children[vocabulary.get_indexer(child.choices)] = offset + child.node_id
+            
+            self.node_feature[i] = feature
+            self.node_offset[i] = lookup_size
+            self.node_fallback_child[i] = offset + node.fallback_child.node_id
+            self.node_fallback_code[i] = vocabulary.get_loc(node.fallback_value)
+            lookup.append(children)
+            lookup_size += len(children)
+        self.lookup = np.concatenate(lookup) if lookup else np.zeros(0, dtype=int)
+        
+        self.segments = {s.segment_id: s.lean() for tree in super_tree.trees.values() for s in tree.segments}
+        self.segment_cutoffs = np.full((super_tree.id_counter, 6), np.nan)
+        self.segment_features = {}
+        for segment in self.segments.values():
+            self.segment_cutoffs[segment.segment_id, :len(segment.gm_cutoffs)] = segment.gm_cutoffs
+            variables = dict.fromkeys(rule['variable'] for rule in reversed(segment.leaf['rules']))
+            self.segment_features[segment.segment_id] = [self.features.index(v) for v in variables]
+            
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as handle:
+            return pickle.load(handle)
+            
+    def save(self, path):
+        with open(path, 'wb') as handle:
+            pickle.dump(self, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            
+    def predict(self, input_row, impute=True):
+        key = tuple(input_row[f] for f in self.supernode_features) if self.supernode_features else SuperCHAID.SINGLETON_KEY
+        if key not in self.tree_roots: return None
+        
+        segment_pairs = {}
+        imputed_pairs = {}
+        values = {}
+        node = self.tree_roots[key]
+        
+        while self.node_feature[node] != RoutingTable.MISSING:
+            feature = self.node_feature[node]
+            variable = self.features[feature]
+            value = values.get(variable, input_row[variable])
+            if not impute and str(value) == "nan": value = '<missing>'
+            
+            code = self.vocabularies[feature].get_indexer([value])[0]
+            child = self.lookup[self.node_offset[node] + code] if code != RoutingTable.MISSING else RoutingTable.MISSING
+            if child == RoutingTable.MISSING:
+                if not impute: return None
+                
+                child = self.node_fallback_child[node]
+                value = self.vocabularies[feature][self.node_fallback_code[node]]
+                imputed_pairs[variable] = value
+                values[variable] = value
+            segment_pairs[variable] = value
+            node = child
+            
+        return self.segments[self.node_segment[node]], segment_pairs, imputed_pairs
+            
+    def predict_batch(self, df, impute=True):
+        segment_ids, _, imputed = self._route(df, impute)
+        gm_cutoffs = self.segment_cutoffs[segment_ids]
+        gm_cutoffs[segment_ids == RoutingTable.MISSING] = np.nan
+        return segment_ids, gm_cutoffs, imputed.any(axis=0)
+        
+    def predict_many(self, df, impute=True):
+        segment_ids, codes, imputed = self._route(df, impute)
+        
+        predictions = []
+        for row, segment_id in enumerate(segment_ids):
+            if segment_id == RoutingTable.MISSING:
+                predictions.append(None)
+                continue
+            
+            segment_pairs = {}
+            imputed_pairs = {}
+            for feature in self.segment_features[segment_id]:
+                value = self.vocabularies[feature][codes[feature, row]]
+                segment_pairs[self.features[feature]] = value
+                if imputed[feature, row]: imputed_pairs[self.features[feature]] = value
+            predictions.append((self.segments[segment_id], segment_pairs, imputed_pairs))
+        return predictions
+        
+    def _route(self, df, impute):
+        nodes = self._roots(df)
+        codes = np.zeros((len(self.features), len(df)), dtype=int)
+        for feature in range(len(self.features)):
+            codes[feature] = self._encode(df, feature, impute)
+        imputed = np.zeros(codes.shape, dtype=bool)
+        
+        rows = np.flatnonzero(nodes != RoutingTable.MISSING)
+        while len(rows) > 0:
+            features = self.node_feature[nodes[rows]]
+            rows, features = rows[features != RoutingTable.MISSING], features[features != RoutingTable.MISSING]
+            
+            current_codes = codes[features, rows]
+            children = self.lookup[self.node_offset[nodes[rows]] + np.maximum(current_codes, 0)]
+            children[current_codes == RoutingTable.MISSING] = RoutingTable.MISSING
+            
+            unmatched = children == RoutingTable.MISSING
+            if impute:
+                unmatched_rows = rows[unmatched]
+                children[unmatched] = self.node_fallback_child[nodes[unmatched_rows]]
+                codes[features[unmatched], unmatched_rows] = self.node_fallback_code[nodes[unmatched_rows]]
+                imputed[features[unmatched], unmatched_rows] = True
+            nodes[rows] = children
+            rows = rows[children != RoutingTable.MISSING]
+            
+        segment_ids = np.where(nodes != RoutingTable.MISSING, self.node_segment[nodes], RoutingTable.MISSING)
+        return segment_ids, codes, imputed
+        
+    def _vocabulary(self, feature):
+        if feature not in self.features:
+            self.features.append(feature)
+            self.vocabularies.append({})
+        return self.vocabularies[self.features.index(feature)]
+        
+    def _roots(self, df):
+        if len(self.supernode_features) == 0:
+            return np.full(len(df), self.roots[0], dtype=int)
+        
+        keys = pd.MultiIndex.from_tuples(self.tree_keys, names=self.supernode_features)
+        trees = keys.get_indexer(pd.MultiIndex.from_frame(df[self.supernode_features]))
+        return np.where(trees != RoutingTable.MISSING, self.roots[trees], RoutingTable.MISSING)
+        
+    def _encode(self, df, feature, impute):
+        values = df[self.features[feature]].to_numpy(dtype=object)
+        if not impute: values = np.where(pd.isna(values), '<missing>', values)
+        return self.vocabularies[feature].get_indexer(values)
+        
+        
 class SuperCHAIDVisualizer:
 
     def __init__(self, super_tree, format="png",
@@ -245,7 +470,7 @@ class SuperCHAIDVisualizer:
         return f"id:{segment.leaf['node']}, rows: {segment.rows_count}, cutoffs:\n{cutoffs}".replace(", ", "\n")
         
     def _adapt_node_str(self, node):
-        return f"id: {node.node_id}, feature: {node.split.column}, rows: {len(node.df)}".replace(", ", "\n")
+        return f"id: {node.node_id}, feature: {node.split.column}, rows: {len(node.indices)}".replace(", ", "\n")
         
     def _create_node(self, tree, node):
         if node.is_terminal:
@@ -1,5 +1,6 @@
 import time
 
+import numpy as np
 from sklearn.model_selection import KFold
 
 
@@ -12,7 +13,7 @@ class Result:
     
     @property
     def train_rows(self):
-        return len(self.segment.segment_df)
+        return self.segment.rows_count
         
     def __str__(self):
         return f"segment: {self.segment}\n rows: {self.rows}, counts: {self.class_counts}"
@@ -20,29 +21,24 @@ class Result:
 
 def evaluate(super_tree, test_df, gm_column_name="gm"):
     results = {}
-    failed = []
     
     for tree in super_tree.trees.values():
         for segment in tree.segments:
             results[segment.segment_id] = Result(segment)
     
-    for i in range(len(test_df)):
-        input_row = test_df.loc[i]
-        prediction = super_tree.predict(input_row, impute=True)
-        if prediction is None:
-            failed.append(i)
-            continue
-
-        predicted_segment, _, _ = prediction
-        predicted_segment_id = predicted_segment.segment_id        
-        result = results[predicted_segment_id]
-        result.rows += 1
+    segment_ids, _, _ = super_tree.predict_batch(test_df, impute=True)
+    failed = list(np.flatnonzero(segment_ids == -1))
+    current_gm = test_df[gm_column_name].to_numpy()
+
+    for segment_id, result in results.items():
+        rows = segment_ids == segment_id
+        result.rows += int(rows.sum())
         
-        current_gm = input_row[gm_column_name]
-        for i, cutoff in enumerate(predicted_segment.gm_cutoffs):
-            if current_gm < cutoff:
-                result.class_counts[i-1] += 1
-                break
+        cutoffs = result.segment.gm_cutoffs
+        class_indices = np.searchsorted(cutoffs, current_gm[rows], side="right")
+        class_counts = np.bincount(class_indices[class_indices < len(cutoffs)], minlength=len(cutoffs))
+        for i in np.flatnonzero(class_counts):
+            result.class_counts[i-1] += int(class_counts[i])
 
     return results, failed
 
@@ -50,6 +46,8 @@ def evaluate(super_tree, test_df, gm_column_name="gm"):
 from dataframe import *
 from chaid import SuperCHAID
 
+df, _ = load_dataset()
+
 kf = KFold(n_splits = 5, shuffle = True)
 for result in kf.split(df):
     train_df = df.iloc[result[0]].reset_index(drop=True)
@@ -1,6 +1,8 @@
 from dataframe import *
 from chaid import SuperCHAID, SuperCHAIDVisualizer
 
+df, _ = load_dataset()
+
 supernode_features = [manufacturing_region]
 features_list = [customer_region, product_family, make_vs_buy]
 dependant_variable = gm
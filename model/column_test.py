@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from CHAID.column import NominalColumn
+
+
+@pytest.mark.parametrize("values", [
+    [3.0, np.nan, 1.0, 2.0, 1.0],
+    [3, np.nan, 1, 2, 3],
+    ["b", np.nan, "a", "c", "a"],
+    ["b", "a", "c", "a"],
+    [1, "a", np.nan, 1],
+    [np.nan, np.nan],
+])
+def test_from_categorical_matches_values(values):
+    categorical = pd.Categorical(values)
+    from_values = NominalColumn(np.array(values, dtype=object))
+    from_categorical = NominalColumn.from_categorical(categorical.codes, categorical.categories)
+
+    assert from_categorical.arr.tolist() == from_values.arr.tolist()
+    assert from_categorical.metadata == from_values.metadata
+
+
+def test_numeric_categories_with_missing_values_are_sorted():
+    categorical = pd.Categorical([3.0, np.nan, 1.0, 2.0])
+    column = NominalColumn.from_categorical(categorical.codes, categorical.categories)
+
+    assert column.arr.tolist() == [2, -1, 0, 1]
+    assert column.metadata == {0: 1.0, 1: 2.0, 2: 3.0, -1: '<missing>'}
@@ -0,0 +1,2 @@
+# chaid_test.py and baseline_test.py are scripts that load the full dataset
+collect_ignore = ["chaid_test.py", "baseline_test.py"]
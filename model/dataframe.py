@@ -1,5 +1,12 @@
+import os
+
 import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+from cache import cache_key, cached
+from features import FeaturePipeline
+
 pd.set_option("display.max_columns", None)
 
 DATASET_PATH = "../dataset/LUMEN_DS.csv"
@@ -8,6 +15,9 @@ SEPARATOR = "|"
 NA_VALUES = "NaN"
 ROWS_LIMIT = None
 IMPUTE_COST_OF_PART = True
+CHUNK_SIZE = None
+USE_CACHE = True
+CACHE_DIR_NAME = "cache"
 
 manufacturing_region = "manufacturing_region"
 manufacturing_location_code = "manufacturing_location_code"
@@ -86,105 +96,35 @@ DATE_COLUMNS = DATE_ONLY_COLUMNS + DATETIME_COLUMNS
 NUMERIC_COLUMNS = INT_COLUMNS + FLOAT_COLUMNS
 ALL_COLUMNS = STRING_COLUMNS + DATE_COLUMNS + NUMERIC_COLUMNS
 
-df = pd.read_csv(DATASET_PATH, sep=SEPARATOR, encoding=ENCODING, nrows=ROWS_LIMIT)
-
-
-for col in STRING_COLUMNS:
-    df[col] = df[col].astype("str")
-    df[col] = df[col].replace("nan", np.nan, regex=True)
-
-for col in DATE_COLUMNS:
-    df[col] = pd.to_datetime(df[col], errors="coerce")
-
-
-if IMPUTE_COST_OF_PART:
-    df[cost_of_part][df[cost_of_part] == 0] = None 
-    df.sort_values(by=[item_code, invoice_date], inplace=True)
-    df[cost_of_part] = df.groupby(by=[item_code]).cost_of_part.fillna(method='ffill')
-    df[cost_of_part][df[cost_of_part].isna()] = 0
-    df[gm] = (df[invoiced_price] - df[cost_of_part]) / df[invoiced_price]
-
+new_old_customer = "new_old_customer"
+ordered_qty_bucket = "ordered_qty_bucket"
 
-df_manufacturing = df[
-    ~df.manufacturing_region.isna() & ~df.manufacturing_location_code.isna()
+KEY_COLUMNS = [
+    item_code,
+    invoice_date,
+    cost_of_part,
+    manufacturing_location_code,
+    manufacturing_region,
+    product_group,
+    product_family,
 ]
 
-manufacturing_dict = dict(
-    zip(
-        df_manufacturing.manufacturing_location_code,
-        df_manufacturing.manufacturing_region,
-    )
-)
-
-df[manufacturing_region] = df.apply(
-    lambda x: manufacturing_dict[x[manufacturing_location_code]]
-    if x[manufacturing_location_code] in manufacturing_dict.keys()
-    else x[manufacturing_region],
-    axis=1,
-)
-
-
-preconditions = (
-    (df.cost_of_part > 0)
-    & (df.invoiced_price > 0)
-    & (df.gm < 1)
-    & (df.gm > 0)
-    & (df.ordered_qty > 0)
-    & (df.invoiced_qty_shipped > 0)
-    & (df.intercompany == "NO")
-    & (df.customer_id != "-99")
-    & (df.make_vs_buy != "RAW MATERIAL")
-    & (df.make_vs_buy != "BUY - CUST. SUPPLIED")
-    & (df.make_vs_buy != "BUY - INTERPLNT TRNS")
-    & (df.make_vs_buy != "PURCHASED (RAW)")
-)
-
-df = df[preconditions].reset_index(drop=True)
-
-
-make_cols = ["MANUFACTURED", "RAW MATERIAL", "FINISHED GOODS"]
-buy_cols = [
-    "BUY",
-    "BUY - IMPORTED",
-    "BUY - LOCAL",
-    "BUY - CUST. SUPPLIED",
-    "BUY - INTERPLNT TRNS",
-    "PURCHASED",
-    "PURCHASED (RAW)",
+RETAINED_COLUMNS = [
+    manufacturing_region,
+    manufacturing_location_code,
+    customer_industry,
+    customer_region,
+    customer_first_invoice_date,
+    top_customer_group,
+    product_family,
+    product_group,
+    make_vs_buy,
+    ordered_qty,
+    invoiced_price,
+    cost_of_part,
+    gm,
 ]
 
-def relabel_make_vs_buy(x):
-    if x in make_cols:
-        return "MAKE"
-    elif x in buy_cols:
-        return "BUY"
-    else:
-        return x
-
-df[make_vs_buy] = df.make_vs_buy.apply(lambda x: relabel_make_vs_buy(x))
-
-
-def relabel_customer_region(region, group):
-    if group == "STAR":
-        return "STAR"
-    else:
-        return region
-
-df[customer_region] = df.apply(
-    lambda x: relabel_customer_region(x[customer_region], x[top_customer_group]), axis=1
-)
-
-
-new_old_customer = "new_old_customer"
-df[new_old_customer] = df.customer_first_invoice_date.apply(lambda x: "NEW" if x.year >= 2015 else "OLD")
-
-
-ordered_qty_bucket = "ordered_qty_bucket"
-bounds = [0, 10, 100, 1_000, 10_000, float("+inf")]
-labels = ['[1, 10]', '(10, 100]', '(100, 1000]', '(1000, 10000]', '(10000, inf)']
-df[ordered_qty_bucket] = pd.cut(df[ordered_qty], bounds, labels=labels)
-
-
 cols_to_remove = [
     customer_id,
     manufacturing_location_code,
@@ -215,4 +155,111 @@ cols_to_remove = [
     num_of_unique_products_on_a_quote,
 ]
 
-df = df.drop(cols_to_remove, axis=1)
+
+def clean_string_column(values):
+    codes, uniques = pd.factorize(values)
+    labels = [np.nan if "nan" in label else label for label in uniques.astype("str")]
+    return np.array(labels + [np.nan], dtype=object)[codes]
+
+
+def forward_fill_cost(item_codes, invoice_dates, cost):
+    item_keys = np.where(item_codes < 0, np.iinfo(np.int64).max, item_codes).astype(np.int64)
+    date_keys = invoice_dates.view(np.int64)
+    date_keys = np.where(np.isnat(invoice_dates), np.iinfo(np.int64).max, date_keys)
+
+    ordered = (item_keys[1:] > item_keys[:-1]) | ((item_keys[1:] == item_keys[:-1]) & (date_keys[1:] >= date_keys[:-1]))
+    order = None if ordered.all() else np.lexsort((date_keys, item_keys))
+    if order is not None:
+        item_codes, cost = item_codes[order], cost[order]
+
+    positions = np.arange(len(cost))
+    known = (cost != 0) & ~np.isnan(cost)
+    group_start = np.maximum.accumulate(np.where(np.r_[True, item_codes[1:] != item_codes[:-1]], positions, 0))
+    last_known = np.maximum.accumulate(np.where(known, positions, -1))
+    filled = (last_known >= group_start) & (item_codes >= 0)
+
+    imputed = np.where(filled, cost[np.maximum(last_known, 0)], 0.0)
+    imputed_count = int(np.count_nonzero(filled & ~known))
+
+    if order is not None:
+        imputed[order] = imputed.copy()
+    return imputed, order, imputed_count
+
+
+def read_chunks(path, rows_limit, chunk_size):
+    dtypes = {col: str for col in STRING_COLUMNS + DATE_COLUMNS}
+    dtypes.update({col: float for col in NUMERIC_COLUMNS})
+    reader = pd.read_csv(path, sep=SEPARATOR, encoding=ENCODING, nrows=rows_limit,
+                         usecols=ALL_COLUMNS, dtype=dtypes, chunksize=chunk_size)
+    return [reader] if chunk_size is None else reader
+
+
+def prepare_dataset(path, rows_limit, impute_cost_of_part, chunk_size, verbose):
+    keys = {col: [] for col in KEY_COLUMNS}
+    retained = []
+    for chunk in read_chunks(path, rows_limit, chunk_size):
+        for col in STRING_COLUMNS:
+            chunk[col] = clean_string_column(chunk[col])
+
+        for col in DATE_COLUMNS:
+            chunk[col] = pd.to_datetime(chunk[col], errors="coerce")
+
+        for col in KEY_COLUMNS:
+            keys[col].append(chunk[col].astype("category") if chunk[col].dtype == object else chunk[col])
+
+        preconditions = (
+            (chunk.invoiced_price > 0)
+            & (chunk.ordered_qty > 0)
+            & (chunk.invoiced_qty_shipped > 0)
+            & (chunk.intercompany == "NO")
+            & (chunk.customer_id != "-99")
+            & (chunk.make_vs_buy != "RAW MATERIAL")
+            & (chunk.make_vs_buy != "BUY - CUST. SUPPLIED")
+            & (chunk.make_vs_buy != "BUY - INTERPLNT TRNS")
+            & (chunk.make_vs_buy != "PURCHASED (RAW)")
+        )
+        retained.append(chunk.loc[preconditions, [col for col in chunk.columns if col in RETAINED_COLUMNS]])
+
+    keys = pd.DataFrame({
+        col: union_categoricals(parts, sort_categories=True) if isinstance(parts[0].dtype, pd.CategoricalDtype)
+        else pd.concat(parts) for col, parts in keys.items()
+    })
+    df = pd.concat(retained)
+
+    rows = df.index.to_numpy()
+    if impute_cost_of_part:
+        cost, order, imputed_count = forward_fill_cost(keys[item_code].cat.codes.to_numpy(),
+                                                       keys[invoice_date].to_numpy(),
+                                                       keys[cost_of_part].to_numpy())
+        if verbose:
+            print(f"Imputed {cost_of_part} for {imputed_count} rows.")
+
+        df[cost_of_part] = cost[rows]
+        df[gm] = (df[invoiced_price] - df[cost_of_part]) / df[invoiced_price]
+
+        if order is not None:
+            keys = keys.take(order)
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            df = df.iloc[np.argsort(rank[rows], kind="stable")]
+
+    feature_pipeline = FeaturePipeline().fit(keys)
+
+    df = df[(df.cost_of_part > 0) & (df.gm < 1) & (df.gm > 0)].reset_index(drop=True)
+
+    df = feature_pipeline.transform(df)
+    df = df.drop(cols_to_remove, axis=1, errors="ignore")
+    return df, feature_pipeline
+
+
+def load_dataset(path=DATASET_PATH, rows_limit=ROWS_LIMIT, impute_cost_of_part=IMPUTE_COST_OF_PART,
+                 use_cache=USE_CACHE, chunk_size=CHUNK_SIZE, verbose=True):
+    def compute():
+        return prepare_dataset(path, rows_limit, impute_cost_of_part, chunk_size, verbose)
+
+    if not use_cache:
+        return compute()
+
+    settings = (rows_limit, impute_cost_of_part, ENCODING, SEPARATOR)
+    cache_path = os.path.join(os.path.dirname(path), CACHE_DIR_NAME, cache_key(path, settings))
+    return cached(cache_path, compute)
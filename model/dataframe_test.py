@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataframe as D
+from dataframe import forward_fill_cost, load_dataset, prepare_dataset
+
+
+def write_extract(path, size, seed):
+    """
+    Writes a small raw extract in the format of the real one: UTF-16, pipe
+    separated, with every column read by read_chunks
+    """
+    rng = np.random.default_rng(seed)
+
+    def pick(values, missing=0.05):
+        picked = np.array(values, dtype=object)[rng.integers(0, len(values), size)]
+        picked[rng.random(size) < missing] = None
+        return picked
+
+    def dates(low, high, missing=0.05):
+        picked = pd.to_datetime(rng.integers(low, high, size), unit="D", origin="2005-01-01")
+        picked = picked.strftime("%Y-%m-%d").to_numpy(dtype=object)
+        picked[rng.random(size) < missing] = None
+        return picked
+
+    price = np.round(rng.uniform(0.5, 100, size), 4)
+    cost = np.round(price * rng.uniform(0.2, 1.1, size), 4)
+    cost[rng.random(size) < 0.2] = 0
+    quantity = np.round(10 ** rng.uniform(-0.3, 5, size))
+    location = pick(["N7", "N13", "B6", "K1", "S1"])
+    group = pick(["PC026", "PC023", "SF002", "PC100"])
+    df = pd.DataFrame({
+        D.manufacturing_region: np.where(rng.random(size) < 0.2, None,
+                                         [{"N7": "North America", "B6": "North America"}.get(x, "Asia") for x in location]),
+        D.manufacturing_location_code: location,
+        D.intercompany: pick(["NO", "NO", "NO", "YES"], 0.01),
+        D.customer_id: pick(["0042", "-99", "17", "300"], 0.01),
+        D.customer_industry: pick(["IC000", "IC001", "IC002"]),
+        D.customer_region: pick(["Asia", "Europe", "North America"]),
+        D.customer_first_invoice_date: dates(0, 6000),
+        D.top_customer_group: pick(["STAR", "OTHER", "OTHER"]),
+        D.item_code: pick(["I%02d" % i for i in range(12)], 0.02),
+        D.product_family: np.where(rng.random(size) < 0.2, None,
+                                   [{"PC023": "PF001"}.get(x, "PF002") for x in group]),
+        D.product_group: group,
+        D.price_last_modified_date_in_the_erp: dates(0, 6000, 0.3),
+        D.born_on_date: dates(0, 6000),
+        D.make_vs_buy: pick(["MANUFACTURED", "BUY", "BUY - LOCAL", "RAW MATERIAL", "FINISHED GOODS", "PURCHASED"]),
+        D.sales_channel_internal: pick(["230", "231"]),
+        D.sales_channel_external: pick(["230", "1"]),
+        D.sales_channel_grouping: pick(["A", "B"], 0.5),
+        D.invoice_date: dates(3000, 3200, 0.02),
+        D.invoice_num: np.arange(size).astype(str),
+        D.invoice_line_num: np.arange(size).astype(str),
+        D.order_date: dates(3000, 3200),
+        D.order_num: np.arange(size).astype(str),
+        D.order_line_num: np.arange(size).astype(str),
+        D.invoiced_qty_shipped: quantity,
+        D.ordered_qty: quantity,
+        D.invoiced_price: price,
+        D.invoiced_price_tx: price,
+        D.cost_of_part: cost,
+        D.material_cost_of_part: 0.0,
+        D.labor_cost_of_part: 0.0,
+        D.overhead_cost_of_part: 0.0,
+        D.gm: (price - cost) / price,
+        D.num_of_unique_products_on_a_quote: rng.integers(1, 10, size),
+    })
+    df.to_csv(path, sep=D.SEPARATOR, encoding=D.ENCODING, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def extract(tmp_path_factory):
+    return write_extract(tmp_path_factory.mktemp("dataset") / "LUMEN_DS.csv", 400, 0)
+
+
+def groupby_ffill(item_codes, invoice_dates, cost):
+    df = pd.DataFrame({"item_code": item_codes, "invoice_date": invoice_dates, "cost_of_part": cost})
+    df.loc[df["cost_of_part"] == 0, "cost_of_part"] = None
+    df.sort_values(by=["item_code", "invoice_date"], inplace=True)
+    df["cost_of_part"] = df.groupby(by=["item_code"]).cost_of_part.fillna(method="ffill")
+    df.loc[df["cost_of_part"].isna(), "cost_of_part"] = 0
+    return df["cost_of_part"].sort_index().to_numpy()
+
+
+def check_forward_fill(item_codes, invoice_dates, cost):
+    codes = pd.Categorical(item_codes).codes.astype(np.int64)
+    filled, order, imputed_count = forward_fill_cost(codes, np.asarray(invoice_dates, dtype="datetime64[ns]"), cost)
+
+    expected = groupby_ffill(item_codes, invoice_dates, cost)
+    np.testing.assert_array_equal(filled, expected)
+    assert imputed_count == np.count_nonzero((expected != 0) & ((cost == 0) | np.isnan(cost)))
+    return order
+
+
+def test_forward_fill_cost_matches_groupby_ffill():
+    items = np.array(["B", "A", "B", "A", None, "C", "A", "B", "C", "A", "C"], dtype=object)
+    dates = pd.to_datetime(["2020-03-01", "2020-01-02", "2020-01-01", "2020-01-01", "2020-01-01", "2020-02-01",
+                            "2020-01-02", None, "2020-01-01", "2020-04-01", "2020-03-01"])
+    # A has a leading missing cost and a tie on 2020-01-02, C starts with a zero
+    cost = np.array([np.nan, 5.0, 3.0, np.nan, 9.0, 4.0, 0.0, 0.0, 0.0, np.nan, np.nan])
+
+    assert check_forward_fill(items, dates, cost) is not None
+
+
+def test_forward_fill_cost_keeps_sorted_input():
+    items = np.array(["A", "A", "A", "B", "B"], dtype=object)
+    dates = pd.to_datetime(["2020-01-01", "2020-01-01", "2020-02-01", "2020-01-01", "2020-03-01"])
+
+    assert check_forward_fill(items, dates, np.array([np.nan, 2.0, 0.0, 3.0, np.nan])) is None
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_forward_fill_cost_matches_groupby_ffill_random(seed):
+    rng = np.random.default_rng(seed)
+    size = 500
+    items = np.array(["I%d" % i for i in rng.integers(0, 30, size)], dtype=object)
+    items[rng.random(size) < 0.05] = None
+    dates = pd.to_datetime(rng.integers(0, 40, size), unit="D", origin="2020-01-01").to_numpy()
+    dates[rng.random(size) < 0.05] = np.datetime64("NaT")
+    cost = rng.uniform(1, 10, size)
+    cost[rng.random(size) < 0.3] = 0
+    cost[rng.random(size) < 0.2] = np.nan
+
+    check_forward_fill(items, dates, cost)
+
+
+def test_load_dataset_matches_prepare_dataset(extract):
+    expected, _ = prepare_dataset(extract, None, True, None, verbose=False)
+
+    uncached, _ = load_dataset(extract, use_cache=False, verbose=False)
+    computed, _ = load_dataset(extract, use_cache=True, verbose=False)
+    loaded, pipeline = load_dataset(extract, use_cache=True, verbose=False)
+
+    assert len(expected) > 0
+    for df in [uncached, computed, loaded]:
+        pd.testing.assert_frame_equal(df, expected)
+    assert pipeline.manufacturing_dict
+
+
+@pytest.mark.parametrize("rows_limit", [None, 250])
+@pytest.mark.parametrize("chunk_size", [3, 64, 150, 400, 1000])
+def test_chunked_ingestion_matches_unchunked(extract, chunk_size, rows_limit):
+    expected, expected_pipeline = prepare_dataset(extract, rows_limit, True, None, verbose=False)
+    df, pipeline = prepare_dataset(extract, rows_limit, True, chunk_size, verbose=False)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert pipeline.manufacturing_dict == expected_pipeline.manufacturing_dict
+    assert pipeline.product_dict == expected_pipeline.product_dict
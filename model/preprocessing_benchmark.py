@@ -0,0 +1,177 @@
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import dataframe
+from dataframe import STRING_COLUMNS, DATE_COLUMNS, IMPUTE_COST_OF_PART, CHUNK_SIZE, SEPARATOR, cols_to_remove, \
+    clean_string_column, forward_fill_cost, prepare_dataset, read_chunks, cost_of_part, customer_region, gm, \
+    invoice_date, invoiced_price, item_code, make_vs_buy, manufacturing_location_code, manufacturing_region, \
+    new_old_customer, ordered_qty, ordered_qty_bucket, product_family, product_group, top_customer_group
+
+DATASET_PATH = sys.argv[1] if len(sys.argv) > 1 else "../dataset/LUMEN_DS.csv"
+ROWS_LIMIT = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] else None
+if len(sys.argv) > 3:
+    dataframe.ENCODING = sys.argv[3]
+
+# the original steps write through chained indexing, as they always did
+warnings.simplefilter("ignore", pd.errors.SettingWithCopyWarning)
+
+
+def legacy_preprocess(path, rows_limit, impute_cost_of_part, string_ids=False, backfill_product_family=None):
+    """
+    The preprocessing of the original dataframe.py, step by step. The known
+    differences of prepare_dataset are off by default and can be switched on
+    to compare the outputs:
+
+    - string_ids reads the string columns as strings. The original read
+      let pandas parse numeric IDs, which drops leading zeros ("0042" and
+      "42" become the same item) and, once a column holds missing values,
+      turns customer_id "-99" into "-99.0", so the "-99" precondition never
+      matches.
+    - backfill_product_family is a product_group -> product_family mapping
+      used to fill missing families, as FeaturePipeline.transform does
+    """
+    if string_ids:
+        df = next(iter(read_chunks(path, rows_limit, None)))
+    else:
+        df = pd.read_csv(path, sep=SEPARATOR, encoding=dataframe.ENCODING, nrows=rows_limit)
+
+    for col in STRING_COLUMNS:
+        df[col] = df[col].astype("str")
+        df[col] = df[col].replace("nan", np.nan, regex=True)
+
+    for col in DATE_COLUMNS:
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+
+    if impute_cost_of_part:
+        df[cost_of_part][df[cost_of_part] == 0] = None
+        df.sort_values(by=[item_code, invoice_date], inplace=True)
+        df[cost_of_part] = df.groupby(by=[item_code]).cost_of_part.fillna(method='ffill')
+        df[cost_of_part][df[cost_of_part].isna()] = 0
+        df[gm] = (df[invoiced_price] - df[cost_of_part]) / df[invoiced_price]
+
+    df_manufacturing = df[~df.manufacturing_region.isna() & ~df.manufacturing_location_code.isna()]
+    manufacturing_dict = dict(zip(df_manufacturing.manufacturing_location_code, df_manufacturing.manufacturing_region))
+    df[manufacturing_region] = df.apply(
+        lambda x: manufacturing_dict[x[manufacturing_location_code]]
+        if x[manufacturing_location_code] in manufacturing_dict.keys()
+        else x[manufacturing_region],
+        axis=1,
+    )
+
+    preconditions = (
+        (df.cost_of_part > 0)
+        & (df.invoiced_price > 0)
+        & (df.gm < 1)
+        & (df.gm > 0)
+        & (df.ordered_qty > 0)
+        & (df.invoiced_qty_shipped > 0)
+        & (df.intercompany == "NO")
+        & (df.customer_id != "-99")
+        & (df.make_vs_buy != "RAW MATERIAL")
+        & (df.make_vs_buy != "BUY - CUST. SUPPLIED")
+        & (df.make_vs_buy != "BUY - INTERPLNT TRNS")
+        & (df.make_vs_buy != "PURCHASED (RAW)")
+    )
+    df = df[preconditions].reset_index(drop=True)
+
+    if backfill_product_family is not None:
+        df[product_family] = df.apply(
+            lambda x: backfill_product_family.get(x[product_group], np.nan)
+            if pd.isna(x[product_family]) else x[product_family],
+            axis=1,
+        )
+
+    make_cols = ["MANUFACTURED", "RAW MATERIAL", "FINISHED GOODS"]
+    buy_cols = ["BUY", "BUY - IMPORTED", "BUY - LOCAL", "BUY - CUST. SUPPLIED", "BUY - INTERPLNT TRNS", "PURCHASED",
+                "PURCHASED (RAW)"]
+    df[make_vs_buy] = df.make_vs_buy.apply(lambda x: "MAKE" if x in make_cols else "BUY" if x in buy_cols else x)
+    df[customer_region] = df.apply(
+        lambda x: "STAR" if x[top_customer_group] == "STAR" else x[customer_region], axis=1
+    )
+    df[new_old_customer] = df.customer_first_invoice_date.apply(lambda x: "NEW" if x.year >= 2015 else "OLD")
+
+    bounds = [0, 10, 100, 1_000, 10_000, float("+inf")]
+    labels = ['[1, 10]', '(10, 100]', '(100, 1000]', '(1000, 10000]', '(10000, inf)']
+    df[ordered_qty_bucket] = pd.cut(df[ordered_qty], bounds, labels=labels)
+    return df.drop(cols_to_remove, axis=1)
+
+
+def legacy_impute(df):
+    df.loc[df["cost_of_part"] == 0, "cost_of_part"] = None
+    df.sort_values(by=["item_code", "invoice_date"], inplace=True)
+    df["cost_of_part"] = df.groupby(by=["item_code"]).cost_of_part.fillna(method='ffill')
+    df.loc[df["cost_of_part"].isna(), "cost_of_part"] = 0
+    return df["cost_of_part"].sort_index().to_numpy()
+
+
+def vectorized_impute(df):
+    item_codes = pd.Categorical(df["item_code"]).codes.astype(np.int64)
+    cost, _, imputed_count = forward_fill_cost(item_codes, df["invoice_date"].to_numpy(), df["cost_of_part"].to_numpy())
+    return cost, imputed_count
+
+
+def align_dtypes(legacy_df, df):
+    for col in df.columns:
+        if legacy_df[col].isna().all() and df[col].isna().all():
+            # the row-wise legacy steps turn an all-missing column into float64, prepare_dataset keeps object
+            legacy_df[col] = legacy_df[col].astype(object)
+            df[col] = df[col].astype(object)
+        elif isinstance(df[col].dtype, pd.CategoricalDtype) and legacy_df[col].dtype == object:
+            df[col] = df[col].astype(object)
+    return legacy_df, df
+
+
+KNOWN_DIFFERENCES = [
+    "string columns are read as strings, so IDs keep their leading zeros",
+    "customer_id \"-99\" is matched as a string, also when the column has missing values",
+    "missing product_family values are filled from product_group",
+]
+
+legacy_start = time.time()
+legacy_df = legacy_preprocess(DATASET_PATH, ROWS_LIMIT, IMPUTE_COST_OF_PART)
+legacy_end = time.time()
+
+vectorized_start = time.time()
+vectorized_df, feature_pipeline = prepare_dataset(DATASET_PATH, ROWS_LIMIT, IMPUTE_COST_OF_PART, CHUNK_SIZE,
+                                                  verbose=True)
+vectorized_end = time.time()
+
+reconciled_df = legacy_preprocess(DATASET_PATH, ROWS_LIMIT, IMPUTE_COST_OF_PART, string_ids=True,
+                                  backfill_product_family=feature_pipeline.product_dict)
+pd.testing.assert_frame_equal(*align_dtypes(reconciled_df, vectorized_df.copy()))
+
+legacy_time = legacy_end - legacy_start
+vectorized_time = vectorized_end - vectorized_start
+print(f"Original steps: {len(legacy_df)} rows, prepare_dataset: {len(vectorized_df)} rows")
+print("Known differences of prepare_dataset from the original steps:")
+for difference in KNOWN_DIFFERENCES:
+    print(f"  - {difference}")
+print(f"Legacy preprocessing time: {legacy_time}")
+print(f"prepare_dataset time: {vectorized_time}")
+print(f"Speedup: {legacy_time / vectorized_time:.1f}x, outputs are identical apart from the known differences")
+
+impute_df = next(iter(read_chunks(DATASET_PATH, ROWS_LIMIT, None)))[["item_code", "invoice_date", "cost_of_part"]]
+impute_df["item_code"] = clean_string_column(impute_df["item_code"])
+impute_df["invoice_date"] = pd.to_datetime(impute_df["invoice_date"], errors="coerce")
+
+legacy_start = time.time()
+legacy_cost = legacy_impute(impute_df.copy())
+legacy_end = time.time()
+
+vectorized_start = time.time()
+vectorized_cost, imputed_count = vectorized_impute(impute_df)
+vectorized_end = time.time()
+
+np.testing.assert_array_equal(legacy_cost, vectorized_cost)
+
+legacy_time = legacy_end - legacy_start
+vectorized_time = vectorized_end - vectorized_start
+print()
+print(f"Imputed rows: {imputed_count}")
+print(f"Legacy imputation time: {legacy_time}")
+print(f"forward_fill_cost time: {vectorized_time}")
+print(f"Speedup: {legacy_time / vectorized_time:.1f}x, imputed costs are identical")
@@ -0,0 +1,102 @@
+import pickle
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from CHAID import Tree
+from CHAID.stats import Stats, bartlett_from_statistics, bartlett_merge_statistics, bartlett_statistics, chisquare, \
+    chisquare_batch, levene_from_statistics, levene_statistics
+
+
+def random_groups(seed):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(rng.uniform(-1, 1), rng.uniform(0.1, 2), rng.integers(2, 200))
+            for _ in range(rng.integers(2, 6))]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chisquare_batch_matches_scipy(seed):
+    rng = np.random.default_rng(seed)
+    tables = [rng.integers(1, 500, size=(2, rng.integers(2, 5))) for _ in range(30)]
+
+    for n_ij, (chi, p_val, dof) in zip(tables, chisquare_batch(tables, False)):
+        m_ij = np.outer(n_ij.sum(axis=1), n_ij.sum(axis=0)) / n_ij.sum()
+        expected = stats.chisquare(n_ij, f_exp=m_ij, ddof=n_ij.size - 1 - dof, axis=None)
+        assert dof == n_ij.shape[1] - 1
+        assert (chi, p_val) == tuple(expected)
+        assert (chi, p_val, dof) == chisquare(n_ij, False)
+
+
+def test_chisquare_batch_weighted():
+    rng = np.random.default_rng(0)
+    tables = [rng.uniform(0.5, 50, size=(2, 3)) for _ in range(5)]
+
+    assert chisquare_batch(tables, True) == [chisquare(n_ij, True) for n_ij in tables]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_bartlett_from_statistics_matches_scipy(seed):
+    groups = random_groups(seed)
+
+    assert bartlett_from_statistics([bartlett_statistics(group) for group in groups]) == tuple(stats.bartlett(*groups))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_bartlett_merge_statistics_matches_merged_values(seed):
+    groups = random_groups(seed) + [np.array([0.5])]
+    merged = bartlett_statistics(groups[0])
+    for group in groups[1:]:
+        merged = bartlett_merge_statistics(bartlett_statistics(group), merged)
+
+    assert merged == pytest.approx(bartlett_statistics(np.concatenate(groups[::-1])), rel=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_levene_from_statistics_matches_scipy(seed):
+    groups = random_groups(seed)
+
+    assert levene_from_statistics([levene_statistics(group) for group in groups]) == tuple(stats.levene(*groups))
+
+
+@pytest.mark.parametrize("variance_test", [None, "levene"])
+def test_pickled_stats_do_not_carry_population(variance_test):
+    sizes = [
+        len(pickle.dumps(Stats(0.05, 30, 0, np.random.default_rng(0).normal(size=size), variance_test=variance_test)))
+        for size in [100, 100000]
+    ]
+
+    assert sizes[0] == sizes[1]
+
+
+def test_unpickled_tree_restores_population():
+    rng = np.random.default_rng(0)
+    tree = Tree.from_numpy(rng.integers(0, 3, (500, 2)), rng.normal(size=500), dep_variable_type="continuous")
+    restored = pickle.loads(pickle.dumps(tree))
+
+    np.testing.assert_array_equal(restored._stats.dep_population, tree.observed.arr)
+    assert restored._stats.variance_test == tree._stats.variance_test
+
+
+@pytest.mark.parametrize("variance_test", ["bartlett", "levene"])
+@pytest.mark.parametrize("distribution", ["normal", "exponential"])
+def test_forced_variance_test(variance_test, distribution):
+    rng = np.random.default_rng(0)
+    ind = rng.integers(0, 2, 5000)
+    dep = getattr(rng, distribution)(size=5000) * (1 + 0.15 * ind)
+    tree = Tree.from_numpy(ind.reshape(-1, 1), dep, dep_variable_type="continuous", max_depth=1,
+                           variance_test=variance_test)
+
+    # the forced test overrides the one the normality test would choose
+    assert Stats(0.05, 30, 0, dep).variance_test == ("bartlett" if distribution == "normal" else "levene")
+    assert tree._stats.variance_test == variance_test
+    expected = getattr(stats, variance_test)(dep[ind == 0], dep[ind == 1])[1]
+    assert tree.tree_store[0].split.p == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("variance_test", ["Bartlett", "f", ""])
+def test_rejects_unknown_variance_test(variance_test):
+    with pytest.raises(ValueError, match="Unknown variance test"):
+        Stats(0.05, 30, 0, np.zeros(10), variance_test=variance_test)
+    with pytest.raises(ValueError, match="Unknown variance test"):
+        Tree.from_numpy(np.zeros((10, 1)), np.zeros(10), dep_variable_type="continuous", variance_test=variance_test)
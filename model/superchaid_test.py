@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import chaid
+from chaid import RoutingTable, SuperCHAID
+
+
+class RecordingExecutor:
+    workers = []
+
+    def __init__(self, max_workers):
+        RecordingExecutor.workers.append(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    size = 2000
+    return pd.DataFrame({
+        "region": rng.choice(["EU", "NA"], size),
+        "family": rng.choice(["A", "B", "C"], size),
+        "channel": rng.choice(["X", "Y"], size),
+        "gm": rng.uniform(0.05, 0.95, size),
+    })
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    RecordingExecutor.workers = []
+    monkeypatch.setattr(chaid, "ProcessPoolExecutor", RecordingExecutor)
+    monkeypatch.setattr(chaid.os, "cpu_count", lambda: 2)
+    return RecordingExecutor
+
+
+def super_chaid(n_jobs):
+    return SuperCHAID(["region"], ["family", "channel"], "gm", verbose=False, min_parent_node_size=100,
+                      min_child_node_size=50, variance_test="levene", n_jobs=n_jobs)
+
+
+@pytest.mark.parametrize("n_jobs", [-1, None])
+def test_all_cores(df, executor, n_jobs):
+    super_chaid(n_jobs).fit(df)
+
+    assert executor.workers == [2]
+
+
+def test_serial(df, executor):
+    super_chaid(1).fit(df)
+
+    assert executor.workers == []
+
+
+@pytest.mark.parametrize("n_jobs", [0, -2, True, False, 2.0, "2"])
+def test_rejects_invalid_jobs(n_jobs):
+    with pytest.raises(ValueError, match="n_jobs must be a positive integer"):
+        super_chaid(n_jobs)
+
+
+@pytest.mark.parametrize("split_n_jobs", [1, 4, np.int64(2), None])
+@pytest.mark.parametrize("split_backend", ["thread", "process"])
+def test_accepts_split_parallelism(split_n_jobs, split_backend):
+    model = SuperCHAID(["region"], ["family"], "gm", split_n_jobs=split_n_jobs, split_backend=split_backend)
+
+    assert (model.split_n_jobs, model.split_backend) == (split_n_jobs, split_backend)
+
+
+@pytest.mark.parametrize("split_n_jobs", [0, -1, True, 1.5, "2"])
+def test_rejects_invalid_split_jobs(split_n_jobs):
+    with pytest.raises(ValueError, match="split_n_jobs must be a positive integer"):
+        SuperCHAID(["region"], ["family"], "gm", split_n_jobs=split_n_jobs)
+
+
+@pytest.mark.parametrize("split_backend", ["threads", "loky", None])
+def test_rejects_invalid_split_backend(split_backend):
+    with pytest.raises(ValueError, match="split_backend must be 'thread' or 'process'"):
+        SuperCHAID(["region"], ["family"], "gm", split_backend=split_backend)
+
+
+def masked_supernode_rows(df, features):
+    """
+    Selects every supernode with one boolean mask per distinct combination in
+    order of appearance, as the supernodes were selected before the groupby
+    """
+    supernode_rows, history = [], set()
+    for values in df[features].values:
+        values = tuple(values)
+        if values in history: continue
+        history.add(values)
+        mask = np.ones(len(df), dtype=bool)
+        for feature, value in zip(features, values):
+            mask &= (df[feature] == value).to_numpy()
+        if mask.any():
+            supernode_rows.append((values, np.flatnonzero(mask)))
+    return supernode_rows
+
+
+@pytest.mark.parametrize("dtype", [object, "category"])
+def test_supernode_rows_match_masks(dtype):
+    rng = np.random.default_rng(0)
+    size = 1000
+    region = rng.choice(np.array(["EU", "NA", "APAC"], dtype=object), size)
+    region[rng.random(size) < 0.1] = np.nan
+    channel = rng.choice(np.array(["X", "Y"], dtype=object), size)
+    channel[rng.random(size) < 0.05] = np.nan
+    df = pd.DataFrame({"region": region, "channel": channel})
+    if dtype == "category":
+        df["region"] = pd.Categorical(df["region"], categories=["EU", "NA", "APAC", "LATAM"])
+        df["channel"] = pd.Categorical(df["channel"], categories=["X", "Y", "Z"])
+    model = SuperCHAID(["region", "channel"], ["family"], "gm", verbose=False)
+
+    supernode_rows = model._determine_supernode_rows(df)
+    expected = masked_supernode_rows(df, ["region", "channel"])
+
+    assert [values for values, _ in supernode_rows] == [values for values, _ in expected]
+    for (_, rows), (_, expected_rows) in zip(supernode_rows, expected):
+        np.testing.assert_array_equal(rows, expected_rows)
+    covered = np.concatenate([rows for _, rows in supernode_rows])
+    assert len(covered) == len(set(covered)) == df.notna().all(axis=1).sum()
+
+
+def make_frame(seed, size):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "region": rng.choice(["EU", "NA"], size),
+        "family": rng.choice(["A", "B", "C", "D", "E"], size),
+        "channel": rng.choice(["X", "Y", "Z"], size),
+    })
+    df.loc[rng.random(size) < 0.05, "family"] = np.nan
+    spread = 0.05 + 0.05 * df.family.map({"A": 0, "B": 0, "C": 1, "D": 2}).fillna(3).to_numpy() \
+        + 0.04 * (df.channel == "Z").to_numpy()
+    df["gm"] = np.clip(0.4 + rng.normal(0, 1, size) * spread, 0.01, 0.99)
+    return df
+
+
+@pytest.fixture(scope="module")
+def model():
+    super_tree = SuperCHAID(["region"], ["family", "channel"], "gm", verbose=False, min_parent_node_size=200,
+                            min_child_node_size=100, variance_test="levene")
+    super_tree.fit(make_frame(0, 4000))
+    return super_tree
+
+
+@pytest.fixture(scope="module")
+def rows():
+    df = make_frame(1, 300).drop(columns="gm")
+    df.loc[::7, "family"] = "Q"
+    df.loc[::11, "channel"] = "W"
+    df.loc[::13, "channel"] = np.nan
+    df.loc[::17, "region"] = "APAC"
+    return df
+
+
+def outcome(prediction):
+    if prediction is None: return None
+    segment, segment_pairs, imputed_pairs = prediction
+    return segment.segment_id, segment_pairs, imputed_pairs
+
+
+def outcomes(predict, df, impute):
+    return [outcome(predict(row, impute)) for _, row in df.iterrows()]
+
+
+@pytest.mark.parametrize("impute", [True, False])
+def test_routing_table_predict_matches_predict(model, rows, impute):
+    expected = outcomes(model.predict, rows, impute)
+
+    assert outcomes(model.routing_table.predict, rows, impute) == expected
+    assert None in expected
+    assert any(prediction is not None and prediction[2] for prediction in expected) == impute
+
+
+@pytest.mark.parametrize("impute", [True, False])
+def test_routing_table_categorical_input(model, rows, impute):
+    expected = outcomes(model.predict, rows, impute)
+
+    assert outcomes(model.routing_table.predict, rows.astype("category"), impute) == expected
+
+
+def test_routing_table_export_round_trip(model, rows, tmp_path):
+    path = str(tmp_path / "chaid-serving.model")
+    model.export(path)
+    loaded = RoutingTable.load(path)
+
+    for impute in [True, False]:
+        assert outcomes(loaded.predict, rows, impute) == outcomes(model.predict, rows, impute)
+    assert all(segment.indices is None for segment in loaded.segments.values())
+
+
+def test_fallbacks_pick_most_common_value_of_largest_child(model):
+    table = model.routing_table
+    for tree_key, tree in model.trees.items():
+        offset = table.tree_roots[tree_key] - tree.root.node_id
+        for node in tree.tree_store:
+            if node.is_terminal: continue
+            variable = node.split.column
+            largest = max(node.children.values(), key=lambda c: len(c.indices))
+            values = tree.supernode_df[variable].iloc[largest.indices]
+            value = max(largest.choices, key=lambda v: (values == v).sum())
+
+            assert (node.fallback_child, node.fallback_value) == (largest, value)
+            assert table.node_fallback_child[offset + node.node_id] == offset + largest.node_id
+            feature = table.features.index(variable)
+            assert table.vocabularies[feature][table.node_fallback_code[offset + node.node_id]] == value
+
+
+@pytest.mark.parametrize("dtype", [object, "category"])
+@pytest.mark.parametrize("impute", [True, False])
+def test_predict_many_matches_predict(model, rows, impute, dtype):
+    df = rows.astype(dtype)
+
+    assert [outcome(p) for p in model.routing_table.predict_many(df, impute)] == outcomes(model.predict, rows, impute)
+
+
+@pytest.mark.parametrize("impute", [True, False])
+def test_predict_batch_matches_predict(model, rows, impute):
+    segment_ids, gm_cutoffs, imputed = model.predict_batch(rows, impute)
+
+    for i, (_, row) in enumerate(rows.iterrows()):
+        prediction = model.predict(row, impute)
+        if prediction is None:
+            assert segment_ids[i] == RoutingTable.MISSING
+            assert np.isnan(gm_cutoffs[i]).all()
+            assert not imputed[i]
+            continue
+        segment, _, imputed_pairs = prediction
+        cutoffs = np.full(6, np.nan)
+        cutoffs[:len(segment.gm_cutoffs)] = segment.gm_cutoffs
+        assert segment_ids[i] == segment.segment_id
+        np.testing.assert_array_equal(gm_cutoffs[i], cutoffs)
+        assert imputed[i] == bool(imputed_pairs)
+
+
+def test_predict_empty(model, rows):
+    segment_ids, gm_cutoffs, imputed = model.predict_batch(rows.iloc[:0])
+
+    assert len(segment_ids) == len(imputed) == 0
+    assert gm_cutoffs.shape == (0, 6)
+    assert model.routing_table.predict_many(rows.iloc[:0]) == []
@@ -10,7 +10,7 @@ class Result:
     
     @property
     def train_rows(self):
-        return len(self.segment.segment_df)
+        return self.segment.rows_count
         
     def __str__(self):
         return f"segment: {self.segment}\n rows: {self.rows}, counts: {self.class_counts}"
@@ -48,6 +48,8 @@ def evaluate(super_tree, test_df, gm_column_name="gm"):
 from dataframe import *
 from chaid import SuperCHAID
 
+df, feature_pipeline = load_dataset()
+
 supernode_features = [manufacturing_region]
 features_list = [customer_industry, customer_region, product_family, make_vs_buy, ordered_qty_bucket, new_old_customer]
 dependant_variable = gm
@@ -57,3 +59,6 @@ super_tree.fit(df)
 
 with open('chaid.model', 'wb') as handle:
     pickle.dump(super_tree, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+super_tree.export('chaid-serving.model')
+feature_pipeline.save('feature-pipeline.model')
@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from CHAID import Tree
+
+# trees fitted by the CHAID package before the split search was rewritten on per-group statistics,
+# contingency tables, batched chi-squares and merge queues
+EXPECTED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "tree-regression.json")
+
+# dependent variable type, weighted, dependent values
+CASES = {
+    "categorical": ("categorical", False, "classes"),
+    "weighted": ("categorical", True, "classes"),
+    "bartlett": ("continuous", False, "normal"),
+    "levene": ("continuous", False, "skewed"),
+}
+SEEDS = [4, 5]
+
+
+def make_data(seed, size=4000):
+    rng = np.random.default_rng(seed)
+    region = rng.choice(np.array(["R%d" % i for i in range(8)], dtype=object), size)
+    region[rng.random(size) < 0.05] = np.nan
+    family = rng.integers(0, 6, size)
+    bucket = rng.integers(1, 7, size).astype(float)
+    bucket[rng.random(size) < 0.05] = np.nan
+    noise = rng.choice(np.array(["N%d" % i for i in range(5)], dtype=object), size)
+
+    region_effect = np.array([{"R0": 0.4, "R3": 0.4, "R5": -0.3}.get(x, 0.0) for x in region])
+    signal = region_effect + 0.15 * (family % 3) + 0.1 * np.nan_to_num(bucket, nan=3.0)
+    ind = np.array([region, family.astype(object), bucket.astype(object), noise], dtype=object).T
+    spread = 1 + 0.12 * (family % 3) + np.array([0.15 if x in ("R0", "R3") else 0.0 for x in region])
+    dep = {
+        "classes": np.digitize(signal + rng.normal(0, 0.5, size), [0.6, 1.0]),
+        "normal": rng.normal(0, 1, size) * spread,
+        "skewed": signal + rng.exponential(0.5, size),
+    }
+    return ind, dep, rng.uniform(0.5, 2.0, size)
+
+
+def fit(case, seed, **parallel):
+    dep_variable_type, weighted, dep_values = CASES[case]
+    ind, dep, weights = make_data(seed)
+    return Tree.from_numpy(ind, dep[dep_values], alpha_merge=0.05, max_depth=3, min_parent_node_size=300,
+                           min_child_node_size=100, split_titles=["region", "family", "bucket", "noise"],
+                           weights=weights if weighted else None,
+                           variable_types=["nominal", "nominal", "ordinal", "nominal"],
+                           dep_variable_type=dep_variable_type, **parallel)
+
+
+def rounded(value):
+    return float("%.10g" % value)
+
+
+def describe(tree):
+    """
+    Describes every node of the tree by its path from the root, independent
+    of the order in which categories were numbered
+    """
+    nodes = {node.node_id: node for node in tree.tree_store}
+    described = {}
+    for node in tree.tree_store:
+        path, parent = [], node
+        while parent.parent is not None:
+            path.append(sorted(str(choice) for choice in parent.choices))
+            parent = nodes[parent.parent]
+
+        split = node.split
+        described[json.dumps(path[::-1])] = {
+            "split": split.column,
+            "groups": sorted(sorted(str(x) for x in group) for group in split.split_map) if split.valid() else [],
+            "p": None if split.p is None else rounded(split.p),
+            "score": None if split.score is None else rounded(split.score),
+            "surrogates": sorted(surrogate.column for surrogate in split.surrogates),
+            "invalid_reason": str(split.invalid_reason),
+            "members": {str(k): rounded(v) for k, v in node.members.items()},
+        }
+    return described
+
+
+@pytest.fixture(scope="module")
+def expected():
+    with open(EXPECTED_PATH) as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("case", list(CASES))
+def test_tree_matches_fixture(expected, case, seed):
+    tree = fit(case, seed)
+
+    if CASES[case][0] == "continuous":
+        assert tree._stats.variance_test == case
+    assert describe(tree) == expected["%s-%d" % (case, seed)]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+@pytest.mark.parametrize("case", list(CASES))
+def test_parallel_tree_matches_serial(case, backend):
+    serial = fit(case, SEEDS[0])
+    parallel = fit(case, SEEDS[0], n_jobs=2, parallel_backend=backend, parallel_node_size=0)
+
+    assert describe(parallel) == describe(serial)
+    assert [node.choices for node in parallel.tree_store] == [node.choices for node in serial.tree_store]
+    assert [repr(node.split) for node in parallel.tree_store] == [repr(node.split) for node in serial.tree_store]
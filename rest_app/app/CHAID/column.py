@@ -12,6 +12,19 @@ def is_sorted(ndarr, nan_val=None):
         store.append(arr[-1] - arr[0] == len(arr) - 1)
     return all(store)
 
+def compact_dtype(low, high):
+    """
+    Returns the smallest signed integer dtype holding every code in
+    [low, high] while keeping its minimum free as a missing sentinel, with a
+    gap so that no code directly follows it, and its maximum free so that
+    code + 1 cannot overflow
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min + 1 < low and high < info.max:
+            return dtype
+    return np.int64
+
 class Column(object):
     """
     A numpy array with metadata
@@ -39,6 +52,18 @@ class Column(object):
     def __iter__(self):
         return iter(self.arr)
 
+    def view(self, key):
+        """
+        Returns a column of the same type holding the rows selected by key.
+        The metadata is shared with this column and nothing is substituted
+        again, so slicing costs little more than indexing the array
+        """
+        column = object.__new__(self.__class__)
+        column.__dict__.update(self.__dict__)
+        column.arr = self.arr[key]
+        column.weights = None if self.weights is None else np.asarray(self.weights)[key]
+        return column
+
     def __getitem__(self, key):
         raise NotImplementedError
 
@@ -48,6 +73,20 @@ class Column(object):
     def possible_groupings(self):
         raise NotImplementedError
 
+    def groupings_with(self, key):
+        """
+        Returns the possible groupings that involve the group key, oriented
+        as possible_groupings gives them
+        """
+        raise NotImplementedError
+
+    def grouping_order(self, grouping):
+        """
+        Returns a sort key that places a possible grouping where
+        possible_groupings yields it, unchanged by merging other groups
+        """
+        raise NotImplementedError
+
     @property
     def type(self):
         """
@@ -90,9 +129,53 @@ class NominalColumn(Column):
         if substitute and metadata is None:
             self.substitute_values(arr)
 
-        self._groupings = MappingDict()
-        for x in np.unique(self.arr):
-            self._groupings[x] = [x]
+        self._grouping_store = None
+        self._grouping_positions = None
+
+    @property
+    def _groupings(self):
+        if self._grouping_store is None:
+            self._grouping_store = MappingDict()
+            for x in np.unique(self.arr):
+                self._grouping_store[x] = [x]
+        return self._grouping_store
+
+    @classmethod
+    def from_categorical(cls, codes, categories, missing_id='<missing>', weights=None, name=None):
+        """
+        Creates a column from the integer codes and categories of a pandas
+        categorical, without comparing the original objects again.
+
+        The categories present are numbered as substitute_values would number
+        them: in sorted order, or in order of appearance if they cannot be
+        sorted.
+
+        Parameters
+        ----------
+        codes : np.array
+            the categorical codes, -1 marking a missing value
+        categories : array-like
+            the values the codes refer to
+        """
+        codes = np.asarray(codes)
+        present = codes >= 0
+        used, first = np.unique(codes[present], return_index=True)
+        try:
+            rank = np.empty(len(categories), dtype=int)
+            rank[sorted(range(len(categories)), key=lambda i: categories[i])] = np.arange(len(categories))
+            used = used[np.argsort(rank[used])]
+        except TypeError:
+            used = used[np.argsort(first)]
+
+        lookup = np.full(len(categories) + 1, -1)
+        lookup[used] = np.arange(len(used))
+        metadata = {new_id: categories[code] for new_id, code in enumerate(used)}
+        if not present.all():
+            metadata[-1] = missing_id
+
+        arr = lookup[codes].astype(compact_dtype(-1, len(used)))
+        return cls(arr, metadata=metadata, missing_id=missing_id,
+                   substitute=False, weights=weights, name=name)
 
     def deep_copy(self):
         """
@@ -107,37 +190,50 @@ class NominalColumn(Column):
         metadata to convert back to the original vector.
 
         np.nan is always given -1, all other objects are given integers in
-        order of apperence.
+        sorted order, or in order of apperence if they cannot be sorted.
+        The vector is factorized in a single pass instead of once per value,
+        and the codes are stored in the smallest integer dtype that fits.
 
         Parameters
         ----------
         vect : np.array
             the vector in which to substitute values in
         """
+        vect = np.asarray(vect)
+        if vect.dtype == object:
+            present = ~np.array([isinstance(x, float) and isnan(x) for x in vect], dtype=bool)
+        elif vect.dtype.kind == 'f':
+            present = ~np.isnan(vect)
+        else:
+            present = np.ones(len(vect), dtype=bool)
 
+        # np.nan is dropped before sorting, it has no place in the order of the other values
         try:
-            unique = np.unique(vect)
+            unique, codes = np.unique(vect[present], return_inverse=True)
+            unique = list(unique)
         except:
-            unique = set(vect)
+            unique, codes = self._factorize_in_order(vect[present])
+        arr = np.full(len(vect), -1)
+        arr[present] = codes.reshape(-1)
 
-        unique = [
-            x for x in unique if not isinstance(x, float) or not isnan(x)
-        ]
-
-        arr = np.copy(vect)
         for new_id, value in enumerate(unique):
-            np.place(arr, arr==value, new_id)
             self.metadata[new_id] = value
-        arr = arr.astype(np.float)
-        np.place(arr, np.isnan(arr), -1)
-        self.arr = arr
+        self.arr = arr.astype(compact_dtype(-1, len(unique)))
 
-        if -1 in arr:
+        if -1 in self.arr:
             self.metadata[-1] = self._missing_id
 
+    @staticmethod
+    def _factorize_in_order(values):
+        index = {}
+        codes = np.array([index.setdefault(x, len(index)) for x in values], dtype=int)
+        return list(index), codes
+
     def __getitem__(self, key):
-        new_weights = None if self.weights is None else self.weights[key]
-        return NominalColumn(self.arr[key], metadata=self.metadata, substitute=False, weights=new_weights, name=self.name)
+        column = self.view(key)
+        column._grouping_store = None
+        column._grouping_positions = None
+        return column
 
     def __setitem__(self, key, value):
         self.arr[key] = value
@@ -149,15 +245,35 @@ class NominalColumn(Column):
     def possible_groupings(self):
         return combinations(self._groupings.keys(), 2)
 
+    def groupings_with(self, key):
+        positions = self._positions()
+        return [
+            (other, key) if positions[other] < positions[key] else (key, other)
+            for other in self._groupings.keys() if other != key
+        ]
+
+    def grouping_order(self, grouping):
+        positions = self._positions()
+        return (positions[grouping[0]], positions[grouping[1]])
+
+    def _positions(self):
+        # merging deletes the later group, so the remaining keys keep their relative order
+        if self._grouping_positions is None:
+            self._grouping_positions = {key: n for n, key in enumerate(self._groupings.keys())}
+        return self._grouping_positions
+
     def all_combinations(self):
         bell_set = self.bell_set(sorted(list(self._groupings.keys())))
         next(bell_set)
         return bell_set
 
     def group(self, x, y):
+        """
+        Merges group y into group x. Only the groupings record the merge,
+        the array keeps the original codes
+        """
         self._groupings[x] += self._groupings[y]
         del self._groupings[y]
-        self.arr[self.arr == y] = x
 
     @property
     def type(self):
@@ -178,21 +294,34 @@ class OrdinalColumn(Column):
 
         if substitute and metadata is None:
             self.arr, self.orig_type = self.substitute_values(self.arr)
+            self.compact()
         elif substitute and metadata and not np.issubdtype(self.arr.dtype, np.integer):
             # custom metadata has been passed in from external source, and must be converted to int
             self.arr = self.arr.astype(int)
             self.metadata = { int(k):v for k, v in metadata.items() }
             self.metadata[self._nan] = missing_id
-
-        self._groupings = {}
-        if groupings is None:
-            for x in np.unique(self.arr):
-                self._groupings[x] = [x, x + 1, False]
-        else:
-            for x in np.unique(self.arr):
-                self._groupings[x] = list(groupings[x])
+            self.compact()
+        elif np.issubdtype(self.arr.dtype, np.integer):
+            self._nan = np.iinfo(self.arr.dtype).min
+
+        self._grouping_source = groupings
+        self._grouping_store = None
+        if groupings is not None:
+            self._grouping_store = self._groupings
         self._possible_groups = None
 
+    @property
+    def _groupings(self):
+        if self._grouping_store is None:
+            self._grouping_store = {}
+            if self._grouping_source is None:
+                for x in np.unique(self.arr).tolist():
+                    self._grouping_store[x] = [x, x + 1, False]
+            else:
+                for x in np.unique(self.arr).tolist():
+                    self._grouping_store[x] = list(self._grouping_source[x])
+        return self._grouping_store
+
     def substitute_values(self, vect):
         if not np.issubdtype(vect.dtype, np.integer):
             uniq = set(vect)
@@ -206,6 +335,21 @@ class OrdinalColumn(Column):
             self.arr = self.arr.astype(float)
         return self.arr.astype(int), self.arr.dtype.type
 
+    def compact(self):
+        """
+        Stores the codes in the smallest integer dtype that fits, moving the
+        missing sentinel to the minimum of that dtype
+        """
+        missing = self.arr == self._nan
+        present = self.arr[~missing]
+        dtype = compact_dtype(present.min(), present.max()) if len(present) else np.int8
+        nan = np.iinfo(dtype).min
+
+        self.arr = self.arr.astype(dtype)
+        self.arr[missing] = nan
+        self.metadata = {nan if k == self._nan else k: v for k, v in self.metadata.items()}
+        self._nan = nan
+
     def deep_copy(self):
         """
         Returns a deep copy.
@@ -215,10 +359,12 @@ class OrdinalColumn(Column):
                              groupings=self._groupings, weights=self.weights)
 
     def __getitem__(self, key):
-        new_weights = None if self.weights is None else self.weights[key]
-        return OrdinalColumn(self.arr[key], metadata=self.metadata, name=self.name,
-                             missing_id=self._missing_id, substitute=True,
-                             groupings=self._groupings, weights=new_weights)
+        column = self.view(key)
+        if self._grouping_store is not None:
+            column._grouping_source = {k: list(v) for k, v in self._grouping_store.items()}
+        column._grouping_store = None
+        column._possible_groups = None
+        return column
 
     def __setitem__(self, key, value):
         self.arr[key] = value
@@ -239,12 +385,19 @@ class OrdinalColumn(Column):
                 (k1, k2) for (k1, minmax1), (k2, minmax2) in candidates
                 if minmax1[1] == minmax2[0]
             ]
-            if self._nan in self.arr:
+            if self._nan in self._groupings:
                 self._possible_groups += [
                     (key, self._nan) for key in self._groupings.keys() if key != self._nan
                 ]
         return self._possible_groups.__iter__()
 
+    def groupings_with(self, key):
+        return [grouping for grouping in self.possible_groupings() if key in grouping]
+
+    def grouping_order(self, grouping):
+        # adjacent ranges come first in the order of their keys, then the merges with the missing group
+        return (1 if grouping[1] == self._nan else 0, grouping[0])
+
     def all_combinations(self):
         bell_set = self.bell_set(sorted(list(self._groupings.keys())), True)
         next(bell_set)
@@ -252,6 +405,10 @@ class OrdinalColumn(Column):
 
 
     def group(self, x, y):
+        """
+        Merges group y into group x. Only the groupings record the merge,
+        the array keeps the original codes
+        """
         self._possible_groups = None
         if y != self._nan:
             x = int(x)
@@ -267,7 +424,6 @@ class OrdinalColumn(Column):
             self._groupings[x][2] = True
 
         del self._groupings[y]
-        self.arr[self.arr == y] = x
 
     @property
     def type(self):
@@ -294,8 +450,7 @@ class ContinuousColumn(Column):
         return ContinuousColumn(self.arr, metadata=self.metadata, missing_id=self._missing_id, weights=self.weights)
 
     def __getitem__(self, key):
-        new_weights = None if self.weights is None else self.weights[key]
-        return ContinuousColumn(self.arr[key], metadata=self.metadata, weights=new_weights)
+        return self.view(key)
 
     def __setitem__(self, key, value):
         self.arr[key] = value
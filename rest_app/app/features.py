@@ -0,0 +1,75 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+make_cols = ["MANUFACTURED", "RAW MATERIAL", "FINISHED GOODS"]
+buy_cols = [
+    "BUY",
+    "BUY - IMPORTED",
+    "BUY - LOCAL",
+    "BUY - CUST. SUPPLIED",
+    "BUY - INTERPLNT TRNS",
+    "PURCHASED",
+    "PURCHASED (RAW)",
+]
+
+bounds = [0, 10, 100, 1_000, 10_000, float("+inf")]
+labels = ['[1, 10]', '(10, 100]', '(100, 1000]', '(1000, 10000]', '(10000, inf)']
+
+
+class FeaturePipeline:
+
+    def __init__(self, manufacturing_dict=None, product_dict=None):
+        self.manufacturing_dict = manufacturing_dict if manufacturing_dict is not None else dict()
+        self.product_dict = product_dict if product_dict is not None else dict()
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as handle:
+            return pickle.load(handle)
+
+    def save(self, path):
+        with open(path, 'wb') as handle:
+            pickle.dump(self, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def fit(self, df):
+        known = df[df["manufacturing_region"].notna() & df["manufacturing_location_code"].notna()]
+        self.manufacturing_dict = dict(zip(known["manufacturing_location_code"], known["manufacturing_region"]))
+
+        known = df[df["product_family"].notna() & df["product_group"].notna()]
+        self.product_dict = dict(zip(known["product_group"], known["product_family"]))
+        return self
+
+    def transform(self, df):
+        mapped_region = df["manufacturing_location_code"].map(self.manufacturing_dict).to_numpy()
+        manufacturing_region = np.where(pd.notna(mapped_region), mapped_region, df["manufacturing_region"].to_numpy())
+
+        product_family = df["product_family"].to_numpy()
+        mapped_family = df["product_group"].map(self.product_dict).to_numpy()
+        product_family = np.where(pd.notna(product_family), product_family, mapped_family)
+
+        make_vs_buy = df["make_vs_buy"].to_numpy()
+        make_vs_buy = np.where(df["make_vs_buy"].isin(make_cols), "MAKE", make_vs_buy)
+        make_vs_buy = np.where(df["make_vs_buy"].isin(buy_cols), "BUY", make_vs_buy)
+
+        customer_region = np.where(df["top_customer_group"] == "STAR", "STAR", df["customer_region"].to_numpy())
+
+        first_invoice_year = df["customer_first_invoice_date"].dt.year.to_numpy()
+        new_old_customer = np.where(first_invoice_year >= 2015, "NEW", "OLD").astype(object)
+
+        ordered_qty = df["ordered_qty"].to_numpy(dtype=float)
+        bucket_codes = np.searchsorted(bounds, ordered_qty, side="left") - 1
+        bucket_codes[np.isnan(ordered_qty) | (bucket_codes >= len(labels))] = -1
+        ordered_qty_bucket = pd.Categorical.from_codes(bucket_codes, categories=labels, ordered=True)
+
+        return df.assign(manufacturing_region=pd.Categorical(manufacturing_region),
+                         customer_industry=pd.Categorical(df["customer_industry"]),
+                         product_family=pd.Categorical(product_family),
+                         make_vs_buy=pd.Categorical(make_vs_buy),
+                         customer_region=pd.Categorical(customer_region),
+                         new_old_customer=pd.Categorical(new_old_customer),
+                         ordered_qty_bucket=ordered_qty_bucket)
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
@@ -1,18 +1,19 @@
-import pickle
 import json
 import graphviz
 
 from flask import request, send_from_directory, jsonify
 from flask import Flask
 
-from util import create_features
+from chaid import RoutingTable
+from features import FeaturePipeline
+from util import create_features, create_features_batch, read_payloads
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "019a5f06d22c4ea89ce4b2177c4bc98b"
 file = None
 
-with open('./resources/chaid.model', 'rb') as handle:
-    model = pickle.load(handle)
+model = RoutingTable.load('./resources/chaid-serving.model')
+pipeline = FeaturePipeline.load('./resources/feature-pipeline.model')
 
 
 @app.route("/", methods=["GET"])
@@ -24,7 +25,7 @@ def home():
 def score():
     payload = request.json
 
-    input_row, message = create_features(payload)
+    input_row, message = create_features(payload, pipeline)
     if input_row is None:
         return message, 400
 
@@ -40,5 +41,35 @@ def score():
     return jsonify(output), 200
 
 
+@app.route("/scoring/batch", methods=["POST"])
+def score_batch():
+    if "file" in request.files:
+        payloads = read_payloads(request.files["file"])
+    else:
+        payloads = request.get_json(silent=True)
+        if not isinstance(payloads, list):
+            return "Expected a JSON array or a CSV file.", 400
+
+    features, messages = create_features_batch(payloads, pipeline)
+    predictions = dict(zip(features.index, model.predict_many(features))) if len(features) > 0 else {}
+
+    outputs = []
+    for i, message in enumerate(messages):
+        if i not in predictions:
+            outputs.append({"error": message})
+            continue
+        if predictions[i] is None:
+            outputs.append({"error": "Chosen example could not be scored."})
+            continue
+
+        segment, segment_pairs, imputed_pairs = predictions[i]
+        output = dict()
+        output["supernode_pairs"] = segment.supernode_pairs
+        output["segment_pairs"] = segment_pairs
+        output["gm_cutoffs"] = segment.gm_cutoffs
+        outputs.append(output)
+    return jsonify(outputs), 200
+
+
 if __name__ == "__main__":
     app.run(debug=True)
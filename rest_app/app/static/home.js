@@ -8,6 +8,7 @@ $(document).ready(() => {
 			const text = evt.target.result;
 			const allRows = text.split(/\r?\n|\r/);
 			const variables = [];
+			const payloads = [];
 			
 			let table = '<table id="data-table" class="hover">';
 			for (let singleRow = 0; singleRow < allRows.length; singleRow++) {
@@ -21,6 +22,7 @@ $(document).ready(() => {
 				}
 				
 				const rowCells = allRows[singleRow].split('|');
+				const payload = {};
 				for (let rowCell = 0; rowCell < rowCells.length; rowCell++) {
 					let textValue = rowCells[rowCell];
                     if(textValue.startsWith('"')) {
@@ -35,6 +37,7 @@ $(document).ready(() => {
 						table += '<td>';
 						table += textValue;
 						table += '</td>';
+						payload[variables[rowCell]] = textValue;
 					}
 				}
 				
@@ -44,6 +47,7 @@ $(document).ready(() => {
 					table += '<tbody>';
 				} else {
 					table += '</tr>';
+					payloads.push(payload);
 				}
 			}
 			table += '</tbody>';
@@ -51,55 +55,65 @@ $(document).ready(() => {
 			
 			$('#load-div').remove();
 			$('#table-div').append(table);
-			$('#data-table').DataTable({
+			const dataTable = $('#data-table').DataTable({
 				"scrollX": true
 			});
 			
+			let predictions = null;
+			$.ajax({
+				type: "POST",
+				url: "/scoring/batch",
+				dataType: "json", 
+				contentType: "application/json; charset=utf-8",
+				data: JSON.stringify(payloads),
+				success: function(result) {
+					predictions = result;
+				},
+				error: function(message) {
+					swal("Error", message.responseText, "error");
+				}
+			});
+			
 			$('#data-table tbody').on('click', 'tr', function () {
-				const payload = {};
-				$(this).children().each(function(index) {
-					payload[variables[index]] = this.innerText;
-				});
-				$.ajax({
-					type: "POST",
-					url: "/scoring",
-					dataType: "json", 
-					contentType: "application/json; charset=utf-8",
-					data: JSON.stringify(payload),
-					success: function(prediction) {
-						let output = '';
-						
-						output += `<b>Manufacturing region:</b> `;
-						output += prediction.supernode_pairs.manufacturing_region;
-						output += '<br>------------------------------------------<br>';
-						
-						for(let key in prediction.segment_pairs) {
-							output += `<b>${key} = </b> ${prediction.segment_pairs[key]}<br>`
-						}
-						output += '------------------------------------------<br>';
-						
-						output += `<b>GM cutoffs:</b><br>`;
-						for(let i = 0; i < prediction.gm_cutoffs.length; i++) {
-							const gm_cutoff = prediction.gm_cutoffs[i];
-							output += `${gm_cutoff.toFixed(3)}`;
-							if(i != prediction.gm_cutoffs.length - 1) {
-								output += ', ';
-							}
-						}
-						
-						const content = document.createElement('div');
-						content.innerHTML = output;
-						
-						swal({
-							title: 'Success',
-							content: content,
-							icon: "success",
-						})
-					},
-					error: function(message) {
-						swal("Error", message.responseText, "error");
+				if (predictions === null) {
+					swal("Info", "Scoring is still in progress.", "info");
+					return;
+				}
+				
+				const prediction = predictions[dataTable.row(this).index()];
+				if (prediction.error) {
+					swal("Error", prediction.error, "error");
+					return;
+				}
+				
+				let output = '';
+				
+				output += `<b>Manufacturing region:</b> `;
+				output += prediction.supernode_pairs.manufacturing_region;
+				output += '<br>------------------------------------------<br>';
+				
+				for(let key in prediction.segment_pairs) {
+					output += `<b>${key} = </b> ${prediction.segment_pairs[key]}<br>`
+				}
+				output += '------------------------------------------<br>';
+				
+				output += `<b>GM cutoffs:</b><br>`;
+				for(let i = 0; i < prediction.gm_cutoffs.length; i++) {
+					const gm_cutoff = prediction.gm_cutoffs[i];
+					output += `${gm_cutoff.toFixed(3)}`;
+					if(i != prediction.gm_cutoffs.length - 1) {
+						output += ', ';
 					}
-				});
+				}
+				
+				const content = document.createElement('div');
+				content.innerHTML = output;
+				
+				swal({
+					title: 'Success',
+					content: content,
+					icon: "success",
+				})
 			});
 			
 			swal("Success", "CSV loaded successfully.", "success");
@@ -1,179 +1,116 @@
 import pandas as pd
 import numpy as np
 
-manufacturing_dict = {'N7': 'North America',
-                      'N13': 'Asia',
-                      'N12': 'Asia',
-                      'N1': 'North America',
-                      'B6': 'North America',
-                      'B1': 'North America',
-                      'B70': 'Asia',
-                      'B77': 'Asia',
-                      'B3': 'North America',
-                      'N8': 'Europe',
-                      'K1': 'Asia',
-                      'N4': 'North America',
-                      'N2': 'North America',
-                      'L1': 'North America',
-                      'B20': 'North America',
-                      'B21': 'North America',
-                      'B76': 'Asia',
-                      'L2': 'North America',
-                      'N15': 'North America',
-                      'C3': 'Asia',
-                      'T1': 'Asia',
-                      'N10': 'Asia',
-                      'N6': 'Europe',
-                      'L4': 'North America',
-                      'K2': 'Asia',
-                      'C5': 'Asia',
-                      'B8': 'North America',
-                      'S1': 'Europe'}
-
-product_dict = {'PC026': 'PF002',
-                'SF002': 'PF002',
-                'PC013': 'PF002',
-                'PC019': 'PF002',
-                'PC002': 'PF002',
-                'PC014': 'PF002',
-                'PC029': 'PF002',
-                'PC004': 'PF002',
-                'PC023': 'PF001',
-                'PC021': 'PF001',
-                'PC009': 'PF001',
-                'PC010': 'PF001',
-                'PC001': 'PF001',
-                'PC017': 'PF002',
-                'PC003': 'PF002',
-                'PC012': 'PF002',
-                'PC005': 'PF001',
-                'PC022': 'PF002',
-                'PC016': 'PF001',
-                'PC011': 'PF001',
-                'PC025': 'PF001',
-                'PC015': 'PF001',
-                'PC008': 'PF001',
-                'PC007': 'PF002',
-                'PC018': 'PF001',
-                'PC030': 'PF002',
-                'PC020': 'PF001',
-                'PC006': 'PF001',
-                'PC028': 'PF002',
-                'SF001': 'PF002',
-                'PC024': 'PF002'}
-
-make_cols = ["MANUFACTURED", "RAW MATERIAL", "FINISHED GOODS"]
 not_allowed_make_vs_buy = ["RAW MATERIAL", "BUY - CUST. SUPPLIED", "BUY - INTERPLNT TRNS", "PURCHASED (RAW)"]
+missing_values = ["", "NA", "NAN", "NaN"]
+
+payload_fields = {"manufacturing_region": "other",
+                  "manufacturing_location_code": "other",
+                  "customer_industry": "other",
+                  "product_family": "other",
+                  "product_group": "other",
+                  "make_vs_buy": "other",
+                  "top_customer_group": "other",
+                  "customer_region": "other",
+                  "customer_first_invoice_date": "other",
+                  "ordered_qty": "numerical",
+                  "gm": "numerical",
+                  "cost_of_part": "numerical",
+                  "invoiced_price": "numerical",
+                  "invoiced_qty_shipped": "numerical",
+                  "intercompany": "other",
+                  "customer_id": "numerical"}
+
+feature_columns = ["manufacturing_region", "customer_region", "customer_industry", "product_family", "make_vs_buy",
+                   "new_old_customer", "ordered_qty_bucket", "gm"]
 
 
-def determine_bucket(ordered_qty):
-    labels = ["[1, 10]", "(10, 100]", "(100, 1000]", "(1000, 10000]", "(10000, inf)"]
-    if 1 <= ordered_qty <= 10:
-        return labels[0]
-    elif 10 < ordered_qty <= 100:
-        return labels[1]
-    elif 100 < ordered_qty <= 1000:
-        return labels[2]
-    elif 1000 < ordered_qty <= 10000:
-        return labels[3]
-    elif ordered_qty > 10000:
-        return labels[4]
+def check_is_missing(variable, type="numerical"):
+    text = variable.astype(str)
+    is_missing = pd.isna(variable)
+    for missing_value in missing_values:
+        is_missing |= text == missing_value
+
+    if type == "numerical":
+        values = pd.to_numeric(np.where(is_missing, "nan", text), errors="coerce")
+        is_invalid = ~is_missing & np.isnan(values) & (np.char.lower(text) != "nan")
+        return values, is_invalid
     else:
-        return np.nan
+        return np.where(is_missing, np.nan, variable), np.zeros(len(variable), dtype=bool)
 
 
-def check_is_missing(variable, type="numerical"):
-    if variable == "" or variable == "NA" or variable == "NAN" or variable == "NaN":
-        return np.nan
-    else:
-        if type == "numerical":
-            return float(variable)
-        else:
-            return variable
+def add_message(messages, fail, message):
+    fail = fail & pd.isna(messages)
+    messages[fail] = message[fail] if isinstance(message, np.ndarray) else message
 
 
 def check_preconditions(cost_of_part, invoiced_price, invoiced_qty_shipped, ordered_qty, intercompany, customer_id,
                         make_vs_buy, gm):
-    if cost_of_part <= 0.0:
-        return True, "Cost of part cannot be <= 0!"
-    if invoiced_price <= 0:
-        return True, "Invoiced price cannot be <= 0!"
-    if invoiced_qty_shipped <= 0:
-        return True, "Invoiced quantity shipped cannot be <= 0!"
-    if ordered_qty <= 0:
-        return True, "Ordered quantity cannot be <= 0!"
-    if intercompany == "YES":
-        return True, "Intercompany cannot be 'YES'!"
-    if customer_id < 0:
-        return True, "Customer ID cannot be negative!"
-    if make_vs_buy in not_allowed_make_vs_buy:
-        return True, make_vs_buy + " value not allowed!"
-    if gm >= 1.0 or gm <= 0.0:
-        return True, "Gross margin can only be defined in range (0,1)!"
-    return False, ""
-
-
-def create_features(json_payload):
-    manufacturing_region = check_is_missing(json_payload["manufacturing_region"], type="other")
-    manufacturing_location_code = check_is_missing(json_payload["manufacturing_location_code"], type="other")
-    customer_industry = check_is_missing(json_payload["customer_industry"], type="other")
-    product_family = check_is_missing(json_payload["product_family"], type="other")
-    product_group = check_is_missing(json_payload["product_group"], type="other")
-    make_vs_buy = check_is_missing(json_payload["make_vs_buy"], type="other")
-    top_customer_group = check_is_missing(json_payload["top_customer_group"], type="other")
-    customer_region = check_is_missing(json_payload["customer_region"], type="other")
-    customer_first_invoice_date = check_is_missing(json_payload["customer_first_invoice_date"], type="other")
-    ordered_qty = check_is_missing(json_payload["ordered_qty"])
-    gm = check_is_missing(json_payload["gm"])
-    cost_of_part = check_is_missing(json_payload["cost_of_part"])
-    invoiced_price = check_is_missing(json_payload["invoiced_price"])
-    invoiced_qty_shipped = check_is_missing(json_payload["invoiced_qty_shipped"])
-    intercompany = check_is_missing(json_payload["intercompany"], type="other")
-    customer_id = check_is_missing(json_payload["customer_id"])
-
-    fail, message = check_preconditions(cost_of_part, invoiced_price, invoiced_qty_shipped, ordered_qty, intercompany,
-                                        customer_id, make_vs_buy, gm)
-
-    if fail:
-        return None, message
-
-    if manufacturing_region is np.nan and manufacturing_location_code is not np.nan:
-        if manufacturing_location_code in manufacturing_dict.keys():
-            manufacturing_region = manufacturing_dict[manufacturing_location_code]
-
-    if product_family is np.nan and product_group is not np.nan:
-        if product_group in product_dict.keys():
-            product_family = product_dict[product_group]
-
-    if make_vs_buy is not np.nan:
-        make_vs_buy = "MAKE" if make_vs_buy in make_cols else "BUY"
-
-    if top_customer_group == "STAR":
-        customer_region = "STAR"
-
-    if customer_first_invoice_date is not np.nan:
-        new_old_customer = "NEW" if int(customer_first_invoice_date.split("-")[0]) >= 2015 else "OLD"
+    messages = np.full(len(cost_of_part), None, dtype=object)
+    add_message(messages, cost_of_part <= 0.0, "Cost of part cannot be <= 0!")
+    add_message(messages, invoiced_price <= 0, "Invoiced price cannot be <= 0!")
+    add_message(messages, invoiced_qty_shipped <= 0, "Invoiced quantity shipped cannot be <= 0!")
+    add_message(messages, ordered_qty <= 0, "Ordered quantity cannot be <= 0!")
+    add_message(messages, intercompany == "YES", "Intercompany cannot be 'YES'!")
+    add_message(messages, customer_id < 0, "Customer ID cannot be negative!")
+    add_message(messages, np.isin(make_vs_buy.astype(str), not_allowed_make_vs_buy),
+                make_vs_buy.astype(str) + np.array(" value not allowed!", dtype=object))
+    add_message(messages, (gm >= 1.0) | (gm <= 0.0), "Gross margin can only be defined in range (0,1)!")
+    return messages
+
+
+def create_features_batch(json_payloads, pipeline):
+    if isinstance(json_payloads, pd.DataFrame):
+        columns = {field: json_payloads[field].to_numpy(dtype=object) if field in json_payloads
+                   else np.full(len(json_payloads), None, dtype=object) for field in payload_fields}
+        messages = np.full(len(json_payloads), None, dtype=object)
     else:
-        new_old_customer = np.nan
+        is_object = np.array([isinstance(payload, dict) for payload in json_payloads], dtype=bool)
+        payloads = [payload if is_object[i] else {} for i, payload in enumerate(json_payloads)]
+        columns = {field: np.array([payload.get(field) for payload in payloads] + [None], dtype=object)[:-1]
+                   for field in payload_fields}
+        messages = np.full(len(payloads), None, dtype=object)
+        add_message(messages, ~is_object, "Expected a JSON object!")
+
+    fields = {}
+    for field, type in payload_fields.items():
+        add_message(messages, pd.isna(columns[field]), f"Missing field '{field}'!")
+        fields[field], is_invalid = check_is_missing(columns[field], type=type)
+        add_message(messages, is_invalid, "Invalid field value!")
+
+    fail_messages = check_preconditions(fields["cost_of_part"], fields["invoiced_price"],
+                                        fields["invoiced_qty_shipped"], fields["ordered_qty"],
+                                        fields["intercompany"], fields["customer_id"],
+                                        fields["make_vs_buy"], fields["gm"])
+    add_message(messages, pd.notna(fail_messages), fail_messages)
 
-    ordered_qty_bucket = determine_bucket(ordered_qty)
+    customer_first_invoice_date = pd.to_datetime(fields["customer_first_invoice_date"], errors="coerce")
+    add_message(messages, pd.notna(fields["customer_first_invoice_date"]) & pd.isna(customer_first_invoice_date),
+                "Invalid field value!")
+    fields["customer_first_invoice_date"] = customer_first_invoice_date
 
-    prediction_row = {
-        "manufacturing_region": manufacturing_region,
-        "customer_region": customer_region,
-        "customer_industry": customer_industry,
-        "product_family": product_family,
-        "make_vs_buy": make_vs_buy,
-        "new_old_customer": new_old_customer,
-        "ordered_qty_bucket": ordered_qty_bucket,
-        "gm": gm,
-    }
+    prediction_rows = pipeline.transform(pd.DataFrame(fields))[feature_columns]
 
-    return pd.DataFrame(prediction_row, index=[0]).loc[0], "success"
+    valid = pd.isna(messages)
+    messages[valid] = "success"
+    return prediction_rows[valid], list(messages)
+
+
+def create_features(json_payload, pipeline):
+    prediction_rows, messages = create_features_batch([json_payload], pipeline)
+    if len(prediction_rows) == 0:
+        return None, messages[0]
+    return prediction_rows.astype(object).loc[0], messages[0]
+
+
+def read_payloads(csv_file):
+    return pd.read_csv(csv_file, sep="|", dtype=str, keep_default_na=False)
 
 
 # Test
 if __name__ == "__main__":
+    from features import FeaturePipeline
+
     json_payload = {"manufacturing_region": "Asia", "manufacturing_location_code": "N13", "intercompany": "NO",
                     "customer_id": "224307", "customer_industry": "IC000", "customer_region": "Asia",
                     "customer_first_invoice_date": "2011-05-27 00:00:00", "top_customer_group": "OTHER",
@@ -187,7 +124,8 @@ if __name__ == "__main__":
                     "material_cost_of_part": ".0000", "labor_cost_of_part": ".0000", "overhead_cost_of_part": ".0000",
                     "gm": "0.25", "num_of_unique_products_on_a_quote": "6"}
 
-    df = create_features(json_payload)[0]
-    message = create_features(json_payload)[1]
+    pipeline = FeaturePipeline.load("./resources/feature-pipeline.model")
+    df = create_features(json_payload, pipeline)[0]
+    message = create_features(json_payload, pipeline)[1]
     print(df)
     print(message)
\ No newline at end of file
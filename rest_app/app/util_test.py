@@ -0,0 +1,290 @@
+import importlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chaid import SuperCHAID
+from features import FeaturePipeline, buy_cols
+from util import create_features, create_features_batch, missing_values, payload_fields, read_payloads
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "dataset-test.csv")
+
+
+@pytest.fixture(scope="module")
+def payloads():
+    return read_payloads(DATASET_PATH)
+
+
+@pytest.fixture(scope="module")
+def pipeline(payloads):
+    return FeaturePipeline().fit(payloads.replace("", np.nan))
+
+
+@pytest.fixture
+def client(payloads, pipeline, tmp_path, monkeypatch):
+    rows, _ = create_features_batch(payloads, pipeline)
+    super_tree = SuperCHAID(["manufacturing_region"], ["customer_region", "product_family", "make_vs_buy"], "gm",
+                            verbose=False, variance_test="levene")
+    super_tree.fit(rows.reset_index(drop=True))
+
+    os.makedirs(tmp_path / "resources")
+    super_tree.export(str(tmp_path / "resources" / "chaid-serving.model"))
+    pipeline.save(str(tmp_path / "resources" / "feature-pipeline.model"))
+
+    monkeypatch.chdir(tmp_path)
+    sys.modules.pop("main", None)
+    main = importlib.import_module("main")
+    return main.app.test_client()
+
+
+def test_create_features_batch_reports_non_objects(payloads, pipeline):
+    valid = payloads.iloc[1].to_dict()
+    rows, messages = create_features_batch([valid, 1, None, "row", [valid]], pipeline)
+
+    assert messages == ["success"] + ["Expected a JSON object!"] * 4
+    assert list(rows.index) == [0]
+
+
+def test_score_batch_mixed_array(client, payloads):
+    valid = payloads.iloc[1].to_dict()
+    response = client.post("/scoring/batch", json=[valid, 1, None, {}])
+
+    assert response.status_code == 200
+    outputs = response.get_json()
+    assert len(outputs) == 4
+    assert "gm_cutoffs" in outputs[0]
+    assert outputs[1] == {"error": "Expected a JSON object!"}
+    assert outputs[2] == {"error": "Expected a JSON object!"}
+    assert outputs[3] == {"error": "Missing field 'manufacturing_region'!"}
+
+
+def test_score_rejects_non_object(client):
+    response = client.post("/scoring", json=[1, 2])
+
+    assert response.status_code == 400
+    assert response.get_data(as_text=True) == "Expected a JSON object!"
+
+
+MANUFACTURING_DICT = {"N7": "North America", "N13": "Asia", "N8": "Europe"}
+PRODUCT_DICT = {"PC026": "PF002", "SF002": "PF002", "PC023": "PF001"}
+LEGACY_MAKE_COLS = ["MANUFACTURED", "RAW MATERIAL", "FINISHED GOODS"]
+LEGACY_NOT_ALLOWED = ["RAW MATERIAL", "BUY - CUST. SUPPLIED", "BUY - INTERPLNT TRNS", "PURCHASED (RAW)"]
+
+
+def legacy_bucket(ordered_qty):
+    labels = ["[1, 10]", "(10, 100]", "(100, 1000]", "(1000, 10000]", "(10000, inf)"]
+    if 1 <= ordered_qty <= 10:
+        return labels[0]
+    elif 10 < ordered_qty <= 100:
+        return labels[1]
+    elif 100 < ordered_qty <= 1000:
+        return labels[2]
+    elif 1000 < ordered_qty <= 10000:
+        return labels[3]
+    elif ordered_qty > 10000:
+        return labels[4]
+    else:
+        return np.nan
+
+
+def legacy_missing(variable, type="numerical"):
+    if variable == "" or variable == "NA" or variable == "NAN" or variable == "NaN":
+        return np.nan
+    return float(variable) if type == "numerical" else variable
+
+
+def legacy_preconditions(cost_of_part, invoiced_price, invoiced_qty_shipped, ordered_qty, intercompany, customer_id,
+                         make_vs_buy, gm):
+    if cost_of_part <= 0.0:
+        return "Cost of part cannot be <= 0!"
+    if invoiced_price <= 0:
+        return "Invoiced price cannot be <= 0!"
+    if invoiced_qty_shipped <= 0:
+        return "Invoiced quantity shipped cannot be <= 0!"
+    if ordered_qty <= 0:
+        return "Ordered quantity cannot be <= 0!"
+    if intercompany == "YES":
+        return "Intercompany cannot be 'YES'!"
+    if customer_id < 0:
+        return "Customer ID cannot be negative!"
+    if make_vs_buy in LEGACY_NOT_ALLOWED:
+        return make_vs_buy + " value not allowed!"
+    if gm >= 1.0 or gm <= 0.0:
+        return "Gross margin can only be defined in range (0,1)!"
+    return None
+
+
+def legacy_create_features(json_payload):
+    """
+    The row-wise create_features of the REST app before the batch path,
+    with its hardcoded location and product dictionaries
+    """
+    fields = {field: legacy_missing(json_payload[field], type=type) for field, type in payload_fields.items()}
+    message = legacy_preconditions(fields["cost_of_part"], fields["invoiced_price"], fields["invoiced_qty_shipped"],
+                                   fields["ordered_qty"], fields["intercompany"], fields["customer_id"],
+                                   fields["make_vs_buy"], fields["gm"])
+    if message is not None:
+        return None, message
+
+    manufacturing_region = fields["manufacturing_region"]
+    if manufacturing_region is np.nan and fields["manufacturing_location_code"] in MANUFACTURING_DICT:
+        manufacturing_region = MANUFACTURING_DICT[fields["manufacturing_location_code"]]
+    product_family = fields["product_family"]
+    if product_family is np.nan and fields["product_group"] in PRODUCT_DICT:
+        product_family = PRODUCT_DICT[fields["product_group"]]
+    make_vs_buy = fields["make_vs_buy"]
+    if make_vs_buy is not np.nan:
+        make_vs_buy = "MAKE" if make_vs_buy in LEGACY_MAKE_COLS else "BUY"
+    customer_region = "STAR" if fields["top_customer_group"] == "STAR" else fields["customer_region"]
+    first_invoice_date = fields["customer_first_invoice_date"]
+    if first_invoice_date is not np.nan:
+        new_old_customer = "NEW" if int(first_invoice_date.split("-")[0]) >= 2015 else "OLD"
+    else:
+        new_old_customer = np.nan
+
+    return {
+        "manufacturing_region": manufacturing_region,
+        "customer_region": customer_region,
+        "customer_industry": fields["customer_industry"],
+        "product_family": product_family,
+        "make_vs_buy": make_vs_buy,
+        "new_old_customer": new_old_customer,
+        "ordered_qty_bucket": legacy_bucket(fields["ordered_qty"]),
+        "gm": fields["gm"],
+    }, "success"
+
+
+def shared_with_training(features, json_payload):
+    """
+    The derivations the REST app took over from training with the shared
+    FeaturePipeline: a known location overrides the given region, unknown
+    make_vs_buy values pass through, rows without a first invoice date are
+    OLD, and quantities below one fall in the first pd.cut bucket
+    """
+    features = dict(features)
+    if json_payload["manufacturing_location_code"] in MANUFACTURING_DICT:
+        features["manufacturing_region"] = MANUFACTURING_DICT[json_payload["manufacturing_location_code"]]
+    if json_payload["make_vs_buy"] not in LEGACY_MAKE_COLS + buy_cols + missing_values:
+        features["make_vs_buy"] = json_payload["make_vs_buy"]
+    if features["new_old_customer"] is np.nan:
+        features["new_old_customer"] = "OLD"
+    if 0 < float(json_payload["ordered_qty"]) < 1:
+        features["ordered_qty_bucket"] = "[1, 10]"
+    return features
+
+
+BASE_PAYLOAD = {"manufacturing_region": "Asia", "manufacturing_location_code": "N13", "intercompany": "NO",
+                "customer_id": "224307", "customer_industry": "IC000", "customer_region": "Asia",
+                "customer_first_invoice_date": "2011-05-27 00:00:00", "top_customer_group": "OTHER",
+                "product_family": "PF002", "product_group": "SF002", "make_vs_buy": "MANUFACTURED",
+                "invoiced_qty_shipped": "4000.000000", "ordered_qty": "4000.000000", "invoiced_price": "2.7800",
+                "cost_of_part": "1.0000", "gm": "0.25"}
+
+FEATURE_CASES = [
+    {},
+    {"make_vs_buy": "BUY - LOCAL"},
+    {"make_vs_buy": "FINISHED GOODS"},
+    {"make_vs_buy": "CONSIGNMENT"},
+    {"make_vs_buy": ""},
+    {"top_customer_group": "STAR"},
+    {"top_customer_group": "STAR", "customer_region": ""},
+    {"customer_first_invoice_date": "2015-01-01 00:00:00"},
+    {"customer_first_invoice_date": "2014-12-31 23:59:59"},
+    {"customer_first_invoice_date": ""},
+    {"manufacturing_region": "Europe", "manufacturing_location_code": "N13"},
+    {"manufacturing_region": "", "manufacturing_location_code": "N7"},
+    {"manufacturing_region": "", "manufacturing_location_code": "Z9"},
+    {"manufacturing_region": "Europe", "manufacturing_location_code": ""},
+    {"product_family": "", "product_group": "PC023"},
+    {"product_family": "", "product_group": "PC999"},
+    {"customer_industry": "NaN"},
+] + [{"ordered_qty": qty} for qty in ["0.5", "1", "10", "10.5", "100", "100.5", "1000", "10000", "10000.5"]]
+
+PRECONDITION_CASES = [
+    {"cost_of_part": "0"},
+    {"invoiced_price": "-1"},
+    {"invoiced_qty_shipped": "0"},
+    {"ordered_qty": "0"},
+    {"intercompany": "YES"},
+    {"customer_id": "-99"},
+    {"make_vs_buy": "RAW MATERIAL"},
+    {"make_vs_buy": "PURCHASED (RAW)"},
+    {"gm": "1.2"},
+    {"gm": "0"},
+    {"cost_of_part": "0", "gm": "1.2"},
+]
+
+# the row-wise path raised on these
+INVALID_CASES = [
+    ({"cost_of_part": "abc"}, "Invalid field value!"),
+    ({"customer_first_invoice_date": "not a date"}, "Invalid field value!"),
+    ({"gm": None}, "Missing field 'gm'!"),
+]
+
+
+@pytest.fixture(scope="module")
+def legacy_pipeline():
+    return FeaturePipeline(manufacturing_dict=MANUFACTURING_DICT, product_dict=PRODUCT_DICT)
+
+
+def payload_with(overrides):
+    payload = dict(BASE_PAYLOAD, **overrides)
+    return {field: value for field, value in payload.items() if value is not None}
+
+
+def as_plain(features):
+    return {field: None if pd.isna(value) else value for field, value in dict(features).items()}
+
+
+def expected_features(payload):
+    features, message = legacy_create_features(payload)
+    return (None if features is None else as_plain(shared_with_training(features, payload))), message
+
+
+@pytest.mark.parametrize("overrides", FEATURE_CASES + PRECONDITION_CASES)
+def test_create_features_matches_row_wise(legacy_pipeline, overrides):
+    payload = payload_with(overrides)
+    features, message = create_features(payload, legacy_pipeline)
+
+    assert ((None if features is None else as_plain(features)), message) == expected_features(payload)
+
+
+@pytest.mark.parametrize("overrides,message", INVALID_CASES)
+def test_create_features_reports_invalid_fields(legacy_pipeline, overrides, message):
+    payload = payload_with(overrides)
+    with pytest.raises((ValueError, KeyError)):
+        legacy_create_features(payload)
+
+    assert create_features(payload, legacy_pipeline) == (None, message)
+
+
+def test_create_features_batch_matches_row_wise(legacy_pipeline):
+    payloads = [payload_with(overrides) for overrides in FEATURE_CASES + PRECONDITION_CASES]
+    payloads += [payload_with(overrides) for overrides, _ in INVALID_CASES]
+    rows, messages = create_features_batch(payloads, legacy_pipeline)
+
+    expected = [expected_features(payload) for payload in payloads[:-len(INVALID_CASES)]]
+    assert messages == [message for _, message in expected] + [message for _, message in INVALID_CASES]
+    assert list(rows.index) == [i for i, (features, _) in enumerate(expected) if features is not None]
+    for i, row in rows.astype(object).iterrows():
+        assert as_plain(row) == expected[i][0]
+
+    # a frame has every column, so only the payloads with all their fields
+    frame_rows, frame_messages = create_features_batch(pd.DataFrame(payloads[:-1]), legacy_pipeline)
+    assert frame_messages == messages[:-1]
+    pd.testing.assert_frame_equal(frame_rows, rows)
+
+
+def test_feature_pipeline_save_load_round_trip(legacy_pipeline, tmp_path):
+    path = str(tmp_path / "feature-pipeline.pkl")
+    legacy_pipeline.save(path)
+    loaded = FeaturePipeline.load(path)
+
+    assert loaded.manufacturing_dict == legacy_pipeline.manufacturing_dict
+    assert loaded.product_dict == legacy_pipeline.product_dict
+    payloads = [payload_with(overrides) for overrides in FEATURE_CASES]
+    pd.testing.assert_frame_equal(create_features_batch(payloads, loaded)[0],
+                                  create_features_batch(payloads, legacy_pipeline)[0])